@@ -1,11 +1,18 @@
 import enum
 import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
 from typing import Protocol
 from enum import Enum
 import klayout.db as db
+import pandas as pd
 from pathlib import Path
 import pydantic
 
+from hades.devices.profiler import Profiler
+from hades.models.tools import norm_diff
+
 ParamSet = pydantic.BaseModel
 
 
@@ -32,26 +39,164 @@ class Device(Protocol):
     def recalibrate_model(self, performances: ParamSet) -> ParamSet: ...
 
 
+def _residual(reference: ParamSet | dict, value: ParamSet | dict) -> float:
+    """
+    Return the largest normalized difference between the numerical fields shared by two parameter sets.
+    Non-numerical fields are ignored.
+    """
+    reference, value = (
+        p.model_dump() if isinstance(p, pydantic.BaseModel) else dict(p)
+        for p in (reference, value)
+    )
+    res = 0.0
+    for key in reference.keys() & value.keys():
+        try:
+            a, b = float(reference[key]), float(value[key])
+        except (TypeError, ValueError):
+            continue
+        if a != b:
+            res = max(res, norm_diff(a, b))
+    return res
+
+
 def generate(
     dut: Device,
     specifications: ParamSet,
     dimensions: ParamSet = None,
     stop: Step = Step.full,
+    max_iter: int = 5,
+    rtol: float = 1e-3,
+    residuals: list[tuple[float, float]] = None,
+    profiler: Profiler = None,
 ) -> ParamSet:
+    """
+    Run the generation flow of _dut_ until the model parameters and the achieved specifications converge.
+    :param dut: device to generate.
+    :param specifications: targeted specifications.
+    :param dimensions: initial dimensions.
+    :param stop: step at which the generation stops.
+    :param max_iter: maximum number of iterations.
+    :param rtol: relative tolerance on the parameters (between two iterations) and on the specifications
+        (between the targeted and the achieved ones) under which the generation is stopped.
+    :param residuals: if given, the (parameters, specifications) residuals of each iteration are appended to it.
+    :param profiler: if given, the timing and memory usage of each stage are recorded in it.
+    :return: the dimensions of the device.
+    """
     if dimensions is None:
         dimensions = {}
     logging.info(f"Generation started with :{specifications}")
-    for i in range(5):
-        dimensions.update(dut.update_model(specifications))
-        logging.info(f"\t{dimensions=}")
-        if stop == Step.dimensions:
-            break
-        dut.update_cell(dimensions)
-        dut.layout.write(dut.name + ".gds")
-        if stop == Step.geometries:
-            break
-        res = dut.update_accurate(Path(dut.name + ".gds"))
-        logging.info(f"\tAccurate model completed with: {res}")
-        dut.recalibrate_model(res)
-        logging.info(f"\tModel recalibrate with: {dut.parameters}")
+    # without timestamps, identical geometries give identical files (see Emx.compute cache)
+    gds_options = db.SaveLayoutOptions()
+    gds_options.gds2_write_timestamps = False
+    if profiler is None:
+        profiler = Profiler()
+    for i in range(max_iter):
+        # the iteration event spans all the stages of the iteration
+        with profiler.stage("iteration", i):
+            with profiler.stage("update_model", i):
+                dimensions.update(dut.update_model(specifications))
+            logging.info(f"\t{dimensions=}")
+            if stop == Step.dimensions:
+                break
+            with profiler.stage("update_cell", i):
+                dut.update_cell(dimensions)
+            with profiler.stage("write", i):
+                dut.layout.write(dut.name + ".gds", gds_options)
+            if stop == Step.geometries:
+                break
+            with profiler.stage("update_accurate", i):
+                res = dut.update_accurate(Path(dut.name + ".gds"))
+            logging.info(f"\tAccurate model completed with: {res}")
+            # recalibrate_model may update the parameters in place
+            parameters = dict(dut.parameters)
+            with profiler.stage("recalibrate_model", i):
+                dut.recalibrate_model(res)
+            logging.info(f"\tModel recalibrate with: {dut.parameters}")
+            res_param = _residual(parameters, dut.parameters)
+            res_spec = _residual(specifications, res)
+            logging.info(
+                f"\tIteration {i}: parameters residual {res_param:.3g}, specifications residual {res_spec:.3g}"
+            )
+            if residuals is not None:
+                residuals.append((res_param, res_spec))
+            if res_param <= rtol and res_spec <= rtol:
+                logging.info(f"Generation converged after {i + 1} iterations.")
+                break
+    else:
+        logging.warning(f"Generation did not converge after {max_iter} iterations.")
     return dut.dimensions
+
+
+def _sweep_point(
+    device_cls: type,
+    name: str,
+    techno: str,
+    specifications: dict,
+    dimensions: dict,
+    stop: Step,
+    max_iter: int,
+    rtol: float,
+    work_dir: Path,
+) -> dict:
+    os.makedirs(work_dir, exist_ok=True)
+    os.chdir(work_dir)
+    dut = device_cls(name=name, techno=techno)
+    res = generate(dut, specifications, dimensions, stop, max_iter=max_iter, rtol=rtol)
+    return dict(res)
+
+
+def sweep(
+    device_cls: type,
+    specs_grid: dict[str, list],
+    techno: str,
+    *,
+    name: str = "dut",
+    dimensions: dict = None,
+    stop: Step = Step.full,
+    max_iter: int = 5,
+    rtol: float = 1e-3,
+    workers: int = 1,
+    work_dir: Path = Path("./sweep"),
+) -> pd.DataFrame:
+    """
+    Run the generation flow on every combination of the specifications in a process pool.
+    Each point is generated in its own sub-directory of _work_dir_.
+    :param device_cls: class of the device to generate (built with name and techno).
+    :param specs_grid: list of values to sweep for each specification.
+    :param techno: name of the technology.
+    :param name: base name of the devices, the index of the point is appended.
+    :param dimensions: initial dimensions given to each generation.
+    :param stop: step at which each generation stops.
+    :param max_iter: maximum number of iterations of each generation.
+    :param rtol: relative tolerance under which each generation is stopped (see generate).
+    :param workers: number of processes running in parallel.
+    :param work_dir: directory where the points are generated.
+    :return: a table with one row per point: specifications, dimensions and error (None on success).
+    """
+    work_dir = Path(work_dir).absolute()
+    points = [dict(zip(specs_grid, val)) for val in product(*specs_grid.values())]
+    logging.info(f"Sweeping {len(points)} points with {workers} workers")
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(
+                _sweep_point,
+                device_cls,
+                f"{name}_{i}",
+                techno,
+                specs,
+                dict(dimensions or {}),
+                stop,
+                max_iter,
+                rtol,
+                work_dir / f"{name}_{i}",
+            )
+            for i, specs in enumerate(points)
+        ]
+        for specs, future in zip(points, futures):
+            try:
+                results.append(dict(specs, **future.result(), error=None))
+            except Exception as e:
+                logging.error(f"Generation failed for {specs}: {e}")
+                results.append(dict(specs, error=f"{type(e).__name__}: {e}"))
+    return pd.DataFrame(results)
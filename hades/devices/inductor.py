@@ -6,6 +6,7 @@ from pathlib import Path
 from scipy.optimize import minimize_scalar
 from hades.wrappers.em import Emx
 from ..layouts.inductor import octagonal_inductor
+from ..layouts.pcell import pcells
 from ..layouts.tools import LayerStack
 
 
@@ -78,8 +79,9 @@ class Inductor:
         self.dimensions = (
             dimensions if type(dimensions) is Dimensions else Dimensions(**dimensions)
         )
-        layer_stack = LayerStack(self.techno)
-        ind = octagonal_inductor(
+        layer_stack = LayerStack.for_techno(self.techno)
+        ind = pcells.get(
+            octagonal_inductor,
             self.layout,
             self.dimensions.d_i,
             self.dimensions.n,
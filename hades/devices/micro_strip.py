@@ -9,6 +9,7 @@ from hades.models.micro_strip import wheeler
 from scipy.optimize import minimize_scalar
 from numpy import sqrt, nan
 from ..layouts.microstrip import straight_line
+from ..layouts.pcell import pcells
 from ..layouts.tools import LayerStack
 from typing import Optional
 
@@ -81,11 +82,12 @@ class MicroStrip:
         self.dimensions = (
             dimensions if type(dimensions) is Dimensions else Dimensions(**dimensions)
         )
-        ms = straight_line(
-            layout=self.layout,
+        ms = pcells.get(
+            straight_line,
+            self.layout,
             width=self.dimensions.W,
             length=self.dimensions.L,
-            layerstack=LayerStack(self.techno),
+            layerstack=LayerStack.for_techno(self.techno),
         )
         return ms
 
@@ -0,0 +1,133 @@
+"""
+Lightweight tracing of the generation flow: wall time and CPU time of each stage and iteration,
+and peak memory of the process at the end of each of them.
+"""
+
+import json
+import logging
+import os
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+from time import perf_counter
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+PROFILE_FORMATS = ("json", "chrome")
+
+
+def check_format(fmt: str) -> None:
+    """
+    Raise a ValueError if _fmt_ is not one of the PROFILE_FORMATS.
+    """
+    if fmt not in PROFILE_FORMATS:
+        raise ValueError(
+            f"Unknown profile format {fmt}, choice are {', '.join(PROFILE_FORMATS)}"
+        )
+
+
+def peak_rss() -> tuple[int, int]:
+    """
+    Return the peak resident set size (in bytes) of the process and of its terminated children
+    since they started (high-water mark, it never decreases).
+    (0, 0) if it cannot be measured on this platform.
+    """
+    if resource is None:
+        return 0, 0
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return tuple(
+        resource.getrusage(who).ru_maxrss * scale
+        for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)
+    )
+
+
+class Profiler:
+    """
+    Record the duration and the resources used by the stages of a flow.
+    Stages are recorded with the stage context manager and can be nested.
+    The memory recorded is the peak of the whole process when the stage ends, not the memory used by the stage.
+    """
+
+    def __init__(self):
+        self.events: list[dict] = []
+        self._origin = perf_counter()
+
+    @contextmanager
+    def stage(self, name: str, iteration: int = None):
+        """
+        Record the stage _name_ running in the with block.
+        :param name: name of the stage.
+        :param iteration: iteration of the flow in which the stage runs.
+        """
+        start = perf_counter()
+        t0 = os.times()
+        try:
+            yield
+        finally:
+            wall = perf_counter() - start
+            t1 = os.times()
+            rss, rss_children = peak_rss()
+            event = {
+                "name": name,
+                "iteration": iteration,
+                "start": start - self._origin,
+                "wall": wall,
+                "cpu": t1.user + t1.system - t0.user - t0.system,
+                "cpu_children": t1.children_user
+                + t1.children_system
+                - t0.children_user
+                - t0.children_system,
+                "peak_rss_process": rss,
+                "peak_rss_children": rss_children,
+            }
+            self.events.append(event)
+            logging.debug(f"\t{name} done in {wall:.3f} s")
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """
+        Return the total wall and CPU times of each stage over all the iterations.
+        """
+        res = {}
+        for e in self.events:
+            s = res.setdefault(e["name"], {"count": 0, "wall": 0.0, "cpu": 0.0})
+            s["count"] += 1
+            s["wall"] += e["wall"]
+            s["cpu"] += e["cpu"] + e["cpu_children"]
+        return res
+
+    def chrome_trace(self) -> dict:
+        """
+        Return the recorded stages in the Chrome trace event format (chrome://tracing, Perfetto).
+        """
+        events = [
+            {
+                "name": e["name"],
+                "cat": "hades",
+                "ph": "X",
+                "ts": e["start"] * 1e6,
+                "dur": e["wall"] * 1e6,
+                "pid": os.getpid(),
+                "tid": 0,
+                "args": {k: e[k] for k in e if k not in ("name", "start", "wall")},
+            }
+            for e in self.events
+        ]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write(self, file: str | Path, fmt: str = "json") -> None:
+        """
+        Write the recorded stages in _file_.
+        :param file: path of the output file.
+        :param fmt: one of PROFILE_FORMATS, "json" for the list of stages and their summary, "chrome" for the Chrome trace format.
+        """
+        check_format(fmt)
+        if fmt == "json":
+            data = {"stages": self.events, "summary": self.summary()}
+        else:
+            data = self.chrome_trace()
+        with open(file, "w") as f:
+            json.dump(data, f, indent=1)
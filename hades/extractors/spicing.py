@@ -5,11 +5,11 @@ This module is used to extract the equivalent spice schematic of a gdsii file.
 import logging
 from os.path import dirname
 from pathlib import Path
-from subprocess import CalledProcessError
+from subprocess import CalledProcessError, CompletedProcess
 
 from klayout import db as kl
 from hades.layouts.tools import LayerStack
-from hades.wrappers.tools import nix_run, to_wsl
+from hades.wrappers.tools import nix_run, nix_run_async, to_wsl
 
 
 def extract_spice(
@@ -33,25 +33,17 @@ def extract_spice(
     return output_path
 
 
-def extract_spice_magic(
+def _magic_command(
     gds_file: Path,
     rc_file: Path,
     cell_name: str = "None",
     output_path: Path = None,
     options: str = "NoPar",
-) -> Path:
+) -> tuple[list[str], Path]:
     """
-    Extract the equivalent spice schematic of a gdsii file using magic-vlsi.
-    :param cell_name: name of the cell in the gdsii file to be extracted.
-    :param gds_file: Input file to be extracted.
-    :param rc_file: RC file to be used in the extraction.
-    :param output_path: Path to the output spice file.
-    :param options: a dictionary of options to be used in the extraction.
-        "NoPar": Extract only the netlist. (No parasitic extraction)
-        "ROnly": Extract only the resistances.
-        "COnly": Extract only the capacitances.
-        "RC": Extract both resistances and capacitances.
-    :return: A spice schematic to be used by ngspice.
+    Write the tcl script extracting _gds_file_ and return the magic command running it.
+    See extract_spice_magic for the parameters.
+    :return: the command and the path of the output spice file.
     """
     if output_path is None:
         output_path = Path(f"{dirname(gds_file)}/{gds_file.stem}.cir")
@@ -93,7 +85,10 @@ def extract_spice_magic(
         to_wsl(tcl_file),
     ]
     logging.info("Extraction with command: " + " ".join(cmd))
-    proc = nix_run(cmd)
+    return cmd, output_path
+
+
+def _check_magic(proc: CompletedProcess) -> None:
     logging.info(proc.stdout)
     logging.error(proc.stderr)
     try:
@@ -101,6 +96,54 @@ def extract_spice_magic(
     except CalledProcessError as e:
         logging.error(proc.stderr)
         raise e
+
+
+def extract_spice_magic(
+    gds_file: Path,
+    rc_file: Path,
+    cell_name: str = "None",
+    output_path: Path = None,
+    options: str = "NoPar",
+) -> Path:
+    """
+    Extract the equivalent spice schematic of a gdsii file using magic-vlsi.
+    :param cell_name: name of the cell in the gdsii file to be extracted.
+    :param gds_file: Input file to be extracted.
+    :param rc_file: RC file to be used in the extraction.
+    :param output_path: Path to the output spice file.
+    :param options: a dictionary of options to be used in the extraction.
+        "NoPar": Extract only the netlist. (No parasitic extraction)
+        "ROnly": Extract only the resistances.
+        "COnly": Extract only the capacitances.
+        "RC": Extract both resistances and capacitances.
+    :return: A spice schematic to be used by ngspice.
+    """
+    cmd, output_path = _magic_command(
+        gds_file, rc_file, cell_name, output_path, options
+    )
+    proc = nix_run(cmd)
+    _check_magic(proc)
+    return output_path
+
+
+async def extract_spice_magic_async(
+    gds_file: Path,
+    rc_file: Path,
+    cell_name: str = "None",
+    output_path: Path = None,
+    options: str = "NoPar",
+    timeout: float = None,
+) -> Path:
+    """
+    Asynchronous version of extract_spice_magic, magic is run with nix_run_async.
+    :param timeout: maximum duration of the extraction in seconds.
+    :return: A spice schematic to be used by ngspice.
+    """
+    cmd, output_path = _magic_command(
+        gds_file, rc_file, cell_name, output_path, options
+    )
+    proc = await nix_run_async(cmd, timeout=timeout)
+    _check_magic(proc)
     return output_path
 
 
@@ -1,8 +1,8 @@
 import logging
 
 import klayout.db as db
-from hades.layouts.tools import LayerStack, Layer
-from hades.layouts.general import via, get_dtext, get_shape
+from hades.layouts.tools import LayerStack, Layer, flatten
+from hades.layouts.general import via, LayoutIndex
 
 
 def mosfet(
@@ -83,7 +83,7 @@ def mosfet(
     mos.shapes(m1_layer.pin).insert(
         db.DText(f"dr{nf}", nf * pitch + diff_space / 2, width / 2)
     )
-    mos.flatten(-1, True)
+    flatten(mos)
     cell.insert(db.DCellInstArray(mos, db.DVector(0, 0)))
     return mos
 
@@ -128,11 +128,11 @@ def line(
 
 
 def connect(cell: db.Cell, layers: LayerStack, label_line: str, label_mos: str):
-    layout = cell.layout()
-    lbl_h, lyr_hp = get_dtext(layout, label_line)
-    lbl_v, lyr_vp = get_dtext(layout, label_mos)
-    box_v, lyr_v = get_shape(layout, lbl_v.position(), lyr_vp)
-    box_h, lbl_h = get_shape(layout, lbl_h.position(), lyr_hp)
+    index = LayoutIndex(cell.layout())
+    lbl_h, lyr_hp = index.get_dtext(label_line)
+    lbl_v, lyr_vp = index.get_dtext(label_mos)
+    box_v, lyr_v = index.get_shape(lbl_v.position(), lyr_vp)
+    box_h, lbl_h = index.get_shape(lbl_h.position(), lyr_hp)
     if box_h.center().y > box_v.center().y:
         top, bottom = box_v.top, box_h.top
     else:
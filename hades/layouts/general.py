@@ -6,17 +6,36 @@ This module contains function to generate general purpose cells.
 import logging
 import math
 import klayout.db as db
-from hades.layouts.tools import LayerStack, ViaLayer
+from hades.layouts.tools import LayerStack, ViaLayer, flatten
+
+
+def _cached_cell(layout: db.Layout, key: tuple) -> db.Cell | None:
+    # the via cells of a layout are stored in its (non persistent) meta info
+    index = layout.meta_info_value(f"hades_via{key}")
+    if index is None or not layout.is_valid_cell_index(index):
+        # never drawn, or removed from the layout (flatten with pruning)
+        return None
+    return layout.cell(index)
+
+
+def _cache_cell(layout: db.Layout, key: tuple, cell: db.Cell):
+    layout.add_meta_info(db.LayoutMetaInfo(f"hades_via{key}", cell.cell_index()))
 
 
 def via(layout: db.Layout, layer: ViaLayer, size: tuple[float, float]) -> db.Cell:
     """
     This function generates a via cell.
+    The cells are shared: a via with the same layer and size as a previous one returns the same cell,
+    the via array is kept as an array instance of a single via cut.
     :param layout: The layout to use.
     :param layer: The Layers to use.
     :param size: tuple of the size (length and width) of the via array to be made.
     :return: a db.Cell containing the via.
     """
+    key = (layer, round(size[0] / layout.dbu), round(size[1] / layout.dbu))
+    v = _cached_cell(layout, key)
+    if v is not None:
+        return v
     v = layout.create_cell("via")
     lyr = layout.layer(layer.layer, layer.datatype)
     if layer.width == 0:
@@ -34,12 +53,14 @@ def via(layout: db.Layout, layer: ViaLayer, size: tuple[float, float]) -> db.Cel
             return math.floor((length - 2 * via_s - via_w) / (via_w + via_g)) + 1
 
         rep_x, rep_y = repetition(size[0]), repetition(size[1])
-        rec = db.DBox(0, 0, via_w, via_w)
-        tmp = layout.create_cell("tmp")
-        tmp.shapes(lyr).insert(rec)
+        cut = _cached_cell(layout, (layer,))
+        if cut is None:
+            cut = layout.create_cell(f"{layer.name or 'via'}_cut")
+            cut.shapes(lyr).insert(db.DBox(0, 0, via_w, via_w))
+            _cache_cell(layout, (layer,), cut)
         shift = [via_w + (r - 1) * (via_w + via_g) for r in (rep_x, rep_y)]
         rep = db.DCellInstArray(
-            tmp.cell_index(),
+            cut.cell_index(),
             db.DVector((size[0] - shift[0]) / 2, (size[1] - shift[1]) / 2),
             db.DVector(via_w + via_g, 0),
             db.DVector(0, via_w + via_g),
@@ -47,7 +68,7 @@ def via(layout: db.Layout, layer: ViaLayer, size: tuple[float, float]) -> db.Cel
             rep_y,
         )
         v.insert(rep)
-        v.flatten(-1, True)
+    _cache_cell(layout, key, v)
     return v
 
 
@@ -82,22 +103,101 @@ def via_stack(
         lyr = layers.get_via_layer(i)
         logging.debug("Via:\t" + lyr.name)
         v.insert(db.DCellInstArray(via(layout, lyr, size), db.DVector(0, 0)))
-    v.flatten(-1, True)
+    flatten(v)
     return v
 
 
+class LayoutIndex:
+    """
+    Index of the labels and of the boxes of a layout, for repeated lookups.
+    The labels are indexed on the first get_dtext (then found in constant time), the boxes of
+    a layer number on the first get_shape on this layer (then found with the box trees of klayout,
+    in logarithmic time). The index is not updated when the layout is modified.
+    """
+
+    def __init__(self, layout: db.Layout):
+        """
+        :param layout: Layout to be indexed.
+        """
+        self.layout = layout
+        self._labels: dict[str, tuple[db.DText, int]] = None
+        self._cell_labels: dict[tuple[int, str], tuple[db.DText, int]] = None
+        # boxes by layer number (whatever the datatype), the property id of the
+        # shapes in the trees is the position of the box in the list (scan order)
+        self._trees: dict[int, tuple[db.Shapes, list[tuple[db.DBox, int]]]] = {}
+
+    def _index_labels(self):
+        self._labels, self._cell_labels = {}, {}
+        for cell in self.layout.each_cell():
+            for lyr in self.layout.layer_indexes():
+                for shape in cell.shapes(lyr).each(db.Shapes.STexts):
+                    label = (shape.dtext, lyr)
+                    self._labels.setdefault(shape.dtext.string, label)
+                    key = (cell.cell_index(), shape.dtext.string)
+                    self._cell_labels.setdefault(key, label)
+
+    def _index_boxes(self, number: int):
+        tree, boxes = db.Shapes(), []
+        layers = [
+            lyr
+            for lyr in self.layout.layer_indexes()
+            if self.layout.get_info(lyr).layer == number
+        ]
+        for cell in self.layout.each_cell():
+            for lyr in layers:
+                for shape in cell.shapes(lyr).each(db.Shapes.SBoxes):
+                    if shape.is_box():
+                        tree.insert(shape.box, len(boxes))
+                        boxes.append((shape.dbox, lyr))
+        self._trees[number] = tree, boxes
+
+    def get_dtext(self, label: str, cell_index: int = None):
+        """
+        Return the dtext with the associated label and its layer.
+        :param label: label (string) to be found.
+        :param cell_index: index of the cell to search in (whole layout by default).
+        :return: DText and layer index, None if not found.
+        """
+        if self._labels is None:
+            self._index_labels()
+        if cell_index is not None:
+            return self._cell_labels.get((cell_index, label))
+        if label not in self._labels:
+            logging.error(f"label {label} not found in layout")
+            return None
+        return self._labels[label]
+
+    def get_shape(self, point: db.DPoint, layer: int):
+        """
+        Return the first box containing _point_ on the layer number of _layer_ and its layer.
+        :param point: point to be found.
+        :param layer: layer index, only its layer number is used.
+        :return: DBox and layer index, None if not found.
+        """
+        number = self.layout.get_info(layer).layer
+        if number not in self._trees:
+            self._index_boxes(number)
+        tree, boxes = self._trees[number]
+        search = db.DBox(point, point).to_itype(self.layout.dbu).enlarged(1)
+        found = [
+            shape.prop_id
+            for shape in tree.each_touching(search)
+            if boxes[shape.prop_id][0].contains(point)
+        ]
+        return boxes[min(found)] if found else None
+
+
 def get_dtext(layout: db.Layout, label: str):
     """
     This function  return the dtext with the associated label in the layout.
+    The layout is scanned up to the label, use a LayoutIndex for repeated lookups.
     :param layout: Layout to be explored.
     :param label: label (string) to be found.
     :return: DText
     """
     for cell in layout.each_cell():
         for lyr in layout.layer_indexes():
-            for shape in cell.shapes(lyr):
-                if not shape.is_text():
-                    continue
+            for shape in cell.shapes(lyr).each(db.Shapes.STexts):
                 if shape.dtext.string == label:
                     return shape.dtext, lyr
     logging.error(f"label {label} not found in layout")
@@ -105,13 +205,17 @@ def get_dtext(layout: db.Layout, label: str):
 
 
 def get_shape(layout: db.Layout, point: db.DPoint, layer: int):
+    """
+    Return the first box containing _point_ on the layer number of _layer_ and its layer.
+    The layout is scanned up to the box, use a LayoutIndex for repeated lookups.
+    """
+    number = layout.get_info(layer).layer
+    layers = [
+        lyr for lyr in layout.layer_indexes() if layout.get_info(lyr).layer == number
+    ]
     for cell in layout.each_cell():
-        for lyr in layout.layer_indexes():
-            for shape in cell.shapes(lyr):
-                ref_info = layout.layer_infos()[layer]
-                current_info = layout.layer_infos()[lyr]
-                if ref_info.layer != current_info.layer:
-                    continue
+        for lyr in layers:
+            for shape in cell.shapes(lyr).each(db.Shapes.SBoxes):
                 if shape.is_box() and shape.dbox.contains(point):
                     return shape.dbox, lyr
     return None
@@ -120,13 +224,15 @@ def get_shape(layout: db.Layout, point: db.DPoint, layer: int):
 def set_as_port(cell: db.Cell, label: str):
     """
     Retrieve label in subcells and copy to cell.
+    As get_dtext, the label is searched in the whole layout (hierarchy included) and
+    the first one found is copied once per child cell of _cell_.
     :param cell:
     :param label:
     :return:
     """
-    lay = cell.layout()
-    for subcell in cell.each_child_cell():
-        res = get_dtext(lay.cell(subcell).layout(), label)
+    index = LayoutIndex(cell.layout())
+    for _ in cell.each_child_cell():
+        res = index.get_dtext(label)
         if res is None:
             continue
         txt, lyr = res
@@ -1,9 +1,9 @@
-from .tools import LayerStack
+from .tools import LayerStack, flatten
 from hades.layouts.general import via
 import klayout.db as db
+import numpy as np
 from numpy import tan, pi
 from typing import Optional
-import logging
 
 
 def octagonal_inductor(
@@ -60,78 +60,82 @@ def octagonal_inductor(
     si = tan(pi / 8) / 2
     even_turn = n_turn % 2 == 0
 
-    for i in range(n_turn):
-        d_a_dbu = d_i_dbu + w_dbu + 2 * i * (w_dbu + g_dbu)
-        end = i == n_turn - 1
-        start = i == 0
-        logging.debug(
-            f"{end=}\t{even_turn=} {0 if (not end) and even_turn else p_gap_dbu / 2}"
-        )
-
-        # Define path points in nm
-        path = [
-            (-i * (w_dbu + g_dbu), 0 if (not end) and even_turn else p_gap_dbu / 2),
-            (-i * (w_dbu + g_dbu), d_a_dbu * si),
-            (d_a_dbu * (0.5 - si) - i * (w_dbu + g_dbu), d_a_dbu / 2),
-            (d_a_dbu * (0.5 + si) - i * (w_dbu + g_dbu), d_a_dbu / 2),
-            (d_a_dbu - i * (w_dbu + g_dbu), d_a_dbu * si),
+    # vertices of the half octagon of every turn (one row per turn)
+    i = np.arange(n_turn)
+    shift = i * (w_dbu + g_dbu)
+    d_a_dbu = d_i_dbu + w_dbu + 2 * shift
+    x = np.stack(
+        (
+            -shift,
+            -shift,
+            d_a_dbu * (0.5 - si) - shift,
+            d_a_dbu * (0.5 + si) - shift,
+            d_a_dbu - shift,
+            d_a_dbu - shift,
+        ),
+        axis=1,
+    )
+    y = np.stack(
+        (
+            np.where((i < n_turn - 1) & even_turn, 0, p_gap_dbu / 2),
+            d_a_dbu * si,
+            d_a_dbu / 2,
+            d_a_dbu / 2,
+            d_a_dbu * si,
+            np.where(even_turn | (i > 0), b_gap_dbu / 2, 0),
+        ),
+        axis=1,
+    )
+    x_e, y_e = x[:, -1], y[:, -1]
+    # crossing between two turns: connection on the top metal and bridge
+    # (one row per turn, the x then the y coordinates of the points)
+    # the first point of the connection is rounded by klayout, the others are truncated
+    connect = np.array(
+        (
+            (x_e, x_e, x_e - w_dbu - g_dbu, x_e - w_dbu - g_dbu),
             (
-                d_a_dbu - i * (w_dbu + g_dbu),
-                b_gap_dbu / 2 if even_turn or not start else 0,
+                y_e,
+                np.trunc(y_e - w_dbu / 2),
+                np.trunc(-y_e + w_dbu / 2),
+                np.trunc(-y_e),
             ),
-        ]
-
-        if end:
-            path.insert(0, (-p_ext_dbu, p_gap_dbu / 2))
+        )
+    ).transpose(2, 0, 1)
+    cross = np.trunc(
+        np.array(
+            (
+                (x_e, x_e, x_e - w_dbu - g_dbu, x_e - w_dbu - g_dbu),
+                (-y_e - w_dbu, -y_e + w_dbu / 2, y_e - w_dbu / 2, y_e + w_dbu),
+            )
+        ).transpose(2, 0, 1)
+    )
+    # position of the two vias of the bridge
+    vias = np.trunc(
+        np.array(
+            ((x_e - 1.5 * w_dbu - g_dbu, y_e), (x_e - w_dbu / 2, -y_e - w_dbu))
+        ).transpose(2, 0, 1)
+    ).astype(int)
 
-        for j in (-1, 1):
-            # Create path for top metal
-            path_pts = [db.Point(int(x), int(j * y)) for x, y in path]
-            path_obj = db.Path(path_pts, w_dbu).polygon()
-            ind.shapes(top_layer).insert(path_obj)
+    def polygon(xs, ys) -> db.Polygon:
+        return db.Path([db.Point(*p) for p in zip(xs, ys)], w_dbu).polygon()
 
-            if not start:
-                if j == 1:
-                    # Create connecting path
-                    connect_pts = [
-                        db.Point(path[-1][0], j * path[-1][1]),
-                        db.Point(int(path[-1][0]), int(path[-1][1] - w_dbu / 2)),
-                        db.Point(
-                            int(path[-1][0] - w_dbu - g_dbu),
-                            int(-path[-1][1] + w_dbu / 2),
-                        ),
-                        db.Point(int(path[-1][0] - w_dbu - g_dbu), int(-path[-1][1])),
-                    ]
-                    connect_path = db.Path(connect_pts, w_dbu).polygon()
-                    ind.shapes(top_layer).insert(connect_path)
-                else:
-                    # Create bridge path
-                    cross_pts = [
-                        db.Point(int(path[-1][0]), int(-path[-1][1] - w_dbu)),
-                        db.Point(int(path[-1][0]), int(-path[-1][1] + w_dbu / 2)),
-                        db.Point(
-                            int(path[-1][0] - w_dbu - g_dbu),
-                            int(path[-1][1] - w_dbu / 2),
-                        ),
-                        db.Point(
-                            int(path[-1][0] - w_dbu - g_dbu), int(path[-1][1] + w_dbu)
-                        ),
-                    ]
-                    cross_path = db.Path(cross_pts, w_dbu).polygon()
-                    ind.shapes(bridge_layer).insert(cross_path)
+    top, bridge = [], []
+    for k, (xs, ys) in enumerate(zip(np.trunc(x).tolist(), np.trunc(y).tolist())):
+        if k == n_turn - 1:
+            xs, ys = [-p_ext_dbu] + xs, [int(p_gap_dbu / 2)] + ys
+        top.append(polygon(xs, [-v for v in ys]))
+        top.append(polygon(xs, ys))
+        if k > 0:
+            top.append(polygon(*connect[k].tolist()))
+            bridge.append(polygon(*cross[k].tolist()))
+    ind.shapes(top_layer).insert(db.Region(top))
+    ind.shapes(bridge_layer).insert(db.Region(bridge))
 
-                    # Add vias
-                    via_layer = layer_stack.get_via_layer(layer_nb - 1)
-                    v1 = via(layout, via_layer, (w_dbu * dbu, w_dbu * dbu))
-                    # Place vias
-                    t1 = db.Trans(
-                        int(path[-1][0] - 1.5 * w_dbu - g_dbu), int(path[-1][1])
-                    )
-                    t2 = db.Trans(
-                        int(path[-1][0] - w_dbu / 2), int(-path[-1][1] - w_dbu)
-                    )
-                    ind.insert(db.CellInstArray(v1.cell_index(), t1))
-                    ind.insert(db.CellInstArray(v1.cell_index(), t2))
+    if n_turn > 1:
+        via_layer = layer_stack.get_via_layer(layer_nb - 1)
+        v1 = via(layout, via_layer, (w_dbu * dbu, w_dbu * dbu))
+        for t in vias[1:].reshape(-1, 2).tolist():
+            ind.insert(db.CellInstArray(v1.cell_index(), db.Trans(*t)))
 
     # Add port labels
     text_p1 = db.Text(pin_name[0], int(-p_ext_dbu), int(p_gap_dbu / 2))
@@ -142,5 +146,5 @@ def octagonal_inductor(
     text_p2.valign = db.Text.VAlignCenter
     ind.shapes(top_layer).insert(text_p1)
     ind.shapes(top_layer).insert(text_p2)
-    ind.flatten(-1, True)
+    flatten(ind)
     return ind
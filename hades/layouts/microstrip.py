@@ -1,4 +1,4 @@
-from .tools import LayerStack, Port
+from .tools import LayerStack, Port, flatten
 from .general import via_stack, via
 import klayout.db as db
 
@@ -81,7 +81,7 @@ def coupled_lines(
     cpl = layout.create_cell(name)
     cpl.insert(db.DCellInstArray(ms1, db.DVector(0, width1 * 1e6 + gap * 1e6) / 2))
     cpl.insert(db.DCellInstArray(ms2, db.DVector(0, -(w2 * 1e6 + gap * 1e6) / 2)))
-    cpl.flatten(-1, True)
+    flatten(cpl)
     return cpl
 
 
@@ -230,7 +230,7 @@ def lange_coupler(
             half_lange.cell_index(), db.DCplxTrans(1, 180, False, le - w - g, w + g)
         )
     )
-    lange.flatten(-1, True)
+    flatten(lange)
     for i in range(4):
         coord = (
             (0, ext + 2.5 * w + 2 * g),
@@ -0,0 +1,120 @@
+"""
+Cache of the cells drawn by the layout generators (parametric cells).
+A generator called again with the same parameters returns the cell already drawn,
+or a copy of it when the target layout is not the one where it was drawn.
+"""
+
+import inspect
+import threading
+from collections import OrderedDict
+from os.path import getmtime
+from typing import Callable
+
+import klayout.db as db
+import numpy as np
+
+from hades.layouts import tools
+from hades.layouts.tools import LayerStack, _pdk_files
+
+PCELL_CACHE_SIZE = 32
+
+
+def _normalize(value):
+    # hashable and stable representation of a parameter
+    if isinstance(value, LayerStack):
+        # the cells are drawn again when the pdk files are modified (as in LayerStack.for_techno)
+        return value.techno, tuple(getmtime(f) for f in _pdk_files(value.techno))
+    if isinstance(value, (float, np.floating)):
+        # remove the rounding noise of the optimizers
+        return float(f"{value:.12g}")
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, (list, tuple)):
+        return tuple(_normalize(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _normalize(v)) for k, v in value.items()))
+    return value
+
+
+class PCellCache:
+    """
+    Least recently used cache of the cells drawn by the layout generators.
+    The cells are keyed by the name of the generator, its normalized parameters, the techno
+    and KEEP_HIERARCHY.
+    A copy of each cell is kept in its own layout, so that the cell can be copied in any layout.
+    """
+
+    def __init__(self, size: int = PCELL_CACHE_SIZE):
+        """
+        :param size: maximum number of cells kept.
+        """
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._cells: OrderedDict[str, db.Layout] = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._cells)
+
+    @staticmethod
+    def key(generator: Callable, *args, **kwargs) -> str:
+        """
+        Return the key of the cell drawn by _generator_ with the given parameters (layout excluded).
+        """
+        params = inspect.signature(generator).bind(None, *args, **kwargs)
+        params.apply_defaults()
+        values = tuple((k, _normalize(v)) for k, v in params.arguments.items())[1:]
+        name = f"{generator.__module__}.{generator.__qualname__}"
+        return f"{name}{values}{tools.KEEP_HIERARCHY}"
+
+    def get(self, generator: Callable, layout: db.Layout, *args, **kwargs) -> db.Cell:
+        """
+        Return the cell drawn by _generator_ in _layout_.
+        The cell is drawn only if it is not already in the cache, otherwise it is copied in _layout_
+        (if it is not already there). An empty layout takes the database unit of the cached cell.
+        :param generator: layout generator, its first argument must be the layout.
+        :param layout: layout where the cell is drawn.
+        :param args: arguments of the generator.
+        :param kwargs: keyword arguments of the generator.
+        :return: the cell.
+        """
+        key = self.key(generator, *args, **kwargs)
+        # the cell is drawn without holding the lock
+        with self._lock:
+            store = self._cells.get(key)
+            if store is not None:
+                self.hits += 1
+                self._cells.move_to_end(key)
+            else:
+                self.misses += 1
+        if store is not None:
+            index = layout.meta_info_value(f"hades_pcell{key}")
+            if index is not None and layout.is_valid_cell_index(index):
+                return layout.cell(index)
+            source = store.top_cell()
+            if layout.cells() == 0:
+                # as drawn by the generator (which may set the database unit)
+                layout.dbu = store.dbu
+            cell = layout.create_cell(source.name)
+            cell.copy_tree(source)
+        else:
+            cell = generator(layout, *args, **kwargs)
+            store = db.Layout()
+            store.dbu = layout.dbu
+            store.create_cell(cell.name).copy_tree(cell)
+            with self._lock:
+                self._cells[key] = store
+                self._cells.move_to_end(key)
+                while len(self._cells) > self.size:
+                    self._cells.popitem(last=False)
+        layout.add_meta_info(db.LayoutMetaInfo(f"hades_pcell{key}", cell.cell_index()))
+        return cell
+
+    def clear(self):
+        with self._lock:
+            self._cells.clear()
+            self.hits = self.misses = 0
+
+
+pcells = PCellCache()
@@ -1,14 +1,18 @@
 import logging
-from dataclasses import dataclass, field
-from os.path import join, dirname, realpath
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field, FrozenInstanceError
+from os.path import join, dirname, realpath, getmtime
 from pathlib import Path
+from types import MappingProxyType
+from typing import Mapping
 from hades.techno import load_pdk
 from hades.parsers.tlef import load_tlef
 from hades.parsers.layermap import load_map, get_number
 import klayout.db as kdb
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Layer:
     layer: int
     datatype: int = 0
@@ -33,7 +37,7 @@ class Layer:
         return self.layer, self._pin
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class ViaLayer(Layer):
     enclosure: float | tuple[float, float] = 0
 
@@ -42,19 +46,36 @@ def default_layer():
     return Layer(0, name="NotFound")
 
 
+STACK_CACHE_SIZE = 8
+_stacks: OrderedDict[str, tuple[tuple[float, ...], "LayerStack"]] = OrderedDict()
+_stacks_lock = threading.RLock()
+
+
+def _pdk_files(techno: str) -> tuple[str, str]:
+    pdk = load_pdk(techno)
+    return tuple(
+        realpath(join(dirname(__file__), "../", pdk["base_dir"], pdk[key]))
+        for key in ("techlef", "layermap")
+    )
+
+
 @dataclass
 class LayerStack:
     techno: str
-    _stack: list[Layer] = field(init=False)
+    _stack: tuple[Layer, ...] = field(init=False)
     _pad: Layer = field(init=False)
     _gate: Layer = field(default_factory=default_layer)
     _nwell: Layer = field(default_factory=default_layer)
     _pwell: Layer = field(default_factory=default_layer)
     grid: float = 1e-9
+    _metals: Mapping[int, Layer] = field(init=False, repr=False, compare=False)
+    _vias: Mapping[int, ViaLayer] = field(init=False, repr=False, compare=False)
+    _ids: Mapping[tuple[int, int], int] = field(init=False, repr=False, compare=False)
+    _names: Mapping[str, Layer] = field(init=False, repr=False, compare=False)
+    _frozen: bool = field(default=False, init=False, repr=False, compare=False)
 
     def __post_init__(self):
-        pdk = load_pdk(self.techno)
-        path = realpath(join(dirname(__file__), "../", pdk["base_dir"], pdk["techlef"]))
+        path, _ = _pdk_files(self.techno)
         t_stack = load_tlef(path)
         self.grid = t_stack.unit
         layer_map = load_map(self.techno)
@@ -128,7 +149,72 @@ class LayerStack:
             self._pad = stack.pop(-1)
             logging.debug(f"{self._pad.name} set as Pad layer")
         logging.info("".join("\t" + lyr.name for lyr in stack))
-        self._stack = stack
+        self._stack = tuple(stack)
+        self._build_indexes()
+
+    def __setattr__(self, name, value):
+        # the stacks shared by for_techno cannot be modified
+        if self._frozen:
+            raise FrozenInstanceError(f"cannot assign to field {name!r}")
+        super().__setattr__(name, value)
+
+    def __delattr__(self, name):
+        if self._frozen:
+            raise FrozenInstanceError(f"cannot delete field {name!r}")
+        super().__delattr__(name)
+
+    def _build_indexes(self):
+        """
+        Build the lookup tables used by the accessors from _stack.
+        """
+        stack = self._stack
+        n = len(stack)
+        # parity offsets of the metal and via layers from the bottom and the top
+        paru = 0 if isinstance(stack[0], ViaLayer) else 1
+        pard = 1 if isinstance(stack[-1], ViaLayer) else 2
+        metals, vias = {}, {}
+        for num in range(-n, n + 1):
+            idx = 2 * num - paru - 1 if num > 0 else 2 * num + pard - 1
+            if num != 0 and -n <= idx < n:
+                metals[num] = stack[idx]
+            idx = 2 * num - paru if num >= 0 else 2 * num + pard
+            if -n <= idx < n:
+                vias[num] = stack[idx]
+        ids = {}
+        for i, lyr in enumerate(stack):
+            ids.setdefault((lyr.layer, lyr.datatype), i)
+        names = {
+            lyr.name: lyr
+            for lyr in (self._gate, self._nwell, self._pwell, self._pad, *stack)
+            if lyr.name != "NotFound"
+        }
+        self._metals = MappingProxyType(metals)
+        self._vias = MappingProxyType(vias)
+        self._ids = MappingProxyType(ids)
+        self._names = MappingProxyType(names)
+
+    @classmethod
+    def for_techno(cls, techno: str) -> "LayerStack":
+        """
+        Return the LayerStack of _techno_, shared by all the callers.
+        The STACK_CACHE_SIZE most recently used stacks are kept and rebuilt
+        when their tlef or layermap files are modified. The returned stack is frozen:
+        setting one of its attributes raises a FrozenInstanceError.
+        :param techno: name of the technology.
+        :return: the LayerStack of the technology.
+        """
+        stamp = tuple(getmtime(f) for f in _pdk_files(techno))
+        with _stacks_lock:
+            if techno in _stacks and _stacks[techno][0] == stamp:
+                _stacks.move_to_end(techno)
+                return _stacks[techno][1]
+            stack = cls(techno)
+            stack._frozen = True
+            _stacks[techno] = (stamp, stack)
+            _stacks.move_to_end(techno)
+            while len(_stacks) > STACK_CACHE_SIZE:
+                _stacks.popitem(last=False)
+            return stack
 
     def __len__(self):
         return len(self._stack)
@@ -137,19 +223,25 @@ class LayerStack:
         if num == 0:
             raise ValueError("nbr cannot be 0")
         try:
-            pard = 0 if isinstance(self._stack[-1], ViaLayer) else 1
-            paru = 1 if isinstance(self._stack[0], ViaLayer) else 2
-            return self._stack[2 * num - paru if num > 0 else 2 * num + pard]
-        except IndexError:
+            return self._metals[num]
+        except KeyError:
             raise IndexError(
                 f"Layer {num} not found. Available layers are {self._stack}"
             )
 
     def get_id(self, layer: int, datatype: int = 0):
-        for i, lyr in enumerate(self._stack):
-            if lyr.layer == layer and lyr.datatype == datatype:
-                return i
-        return None
+        return self._ids.get((layer, datatype))
+
+    def get_layer(self, name: str) -> Layer:
+        """
+        Return the layer called _name_ (metal, via, pad, gate or well).
+        """
+        try:
+            return self._names[name]
+        except KeyError:
+            raise KeyError(
+                f"Layer {name} not found. Available layers are {list(self._names)}"
+            )
 
     def get_pad_layer(self) -> Layer:
         return self._pad
@@ -167,9 +259,10 @@ class LayerStack:
                 "Last Via layer not found. Last layer in stack is a metal Layer\n"
                 + "".join("\t" + lyr.name for lyr in self._stack)
             )
-        pard = 1 if isinstance(self._stack[-1], ViaLayer) else 2
-        paru = 0 if isinstance(self._stack[0], ViaLayer) else 1
-        return self._stack[2 * num - paru if num >= 0 else 2 * num + pard]
+        try:
+            return self._vias[num]
+        except KeyError:
+            raise IndexError(f"Via {num} not found. Available layers are {self._stack}")
 
 
 @dataclass
@@ -194,6 +287,22 @@ class Port:
         return f"{self.name}={self.name}:{self.ref}"
 
 
+# keep the hierarchy (sub-cells and arrays) of the generated cells instead of flattening them.
+# The flat geometry is then only computed where it is needed (EM geometry builders).
+KEEP_HIERARCHY = False
+
+
+def flatten(cell: kdb.Cell) -> kdb.Cell:
+    """
+    Flatten _cell_ and remove its unused sub-cells, unless KEEP_HIERARCHY is set.
+    :param cell: cell to flatten.
+    :return: the cell.
+    """
+    if not KEEP_HIERARCHY:
+        cell.flatten(-1, True)
+    return cell
+
+
 def check_diff(gds1: str | Path, gds2: str | Path) -> bool:
     """
     Test if the 2 gds files are the same. Raise error if they differ.
@@ -9,7 +9,8 @@ from pathlib import Path
 from hades.devices.mos import Mos
 from hades.devices.inductor import Inductor
 from hades.devices.micro_strip import MicroStrip
-from hades.devices.device import generate, Step
+from hades.devices.device import generate, sweep, Step
+from hades.devices.profiler import Profiler, check_format
 import yaml
 from os.path import join, dirname
 from os import makedirs
@@ -36,8 +37,20 @@ if shutil.which("openEMS"):
 
 
 @app.command(name="generate")
-def generate_cli(design_yaml: Path = "./design.yml", stop: str = "full") -> None:
-    """Main command. Run the flow until convergence using _design.yaml_. The design can be stopped at a specific step using the _stop_ option."""
+def generate_cli(
+    design_yaml: Path = "./design.yml",
+    stop: str = "full",
+    max_iter: int = 5,
+    rtol: float = 1e-3,
+    profile: Path = None,
+    profile_format: str = "json",
+) -> None:
+    """Main command. Run the flow until convergence using _design.yaml_. The design can be stopped at a specific step using the _stop_ option.
+    The flow stops when the model and the achieved specifications are within _rtol_, or after _max_iter_ iterations.
+    The time and memory used by each step are written in _profile_ ("json" or "chrome" trace _profile_format_)."""
+    if profile is not None:
+        # fail before the generation, not after it
+        check_format(profile_format)
     with open(design_yaml) as f:
         conf = yaml.load(f, Loader=yaml.Loader)
     design = conf["design"]
@@ -50,7 +63,54 @@ def generate_cli(design_yaml: Path = "./design.yml", stop: str = "full") -> None
     else:
         raise RuntimeError("Unknown device, choice are mos, inductor")
     dimensions = design["dimensions"]
-    generate(dut, design["specifications"], dimensions, Step[stop])
+    profiler = Profiler()
+    generate(
+        dut,
+        design["specifications"],
+        dimensions,
+        Step[stop],
+        max_iter=max_iter,
+        rtol=rtol,
+        profiler=profiler,
+    )
+    if profile is not None:
+        profiler.write(profile, profile_format)
+
+
+@app.command(name="sweep")
+def sweep_cli(
+    design_yaml: Path = "./design.yml",
+    workers: int = 1,
+    stop: str = "full",
+    max_iter: int = 5,
+    rtol: float = 1e-3,
+    output: Path = "./sweep.csv",
+) -> None:
+    """Run the flow on every combination of the specifications given as lists in _design.yaml_, using _workers_ processes. The results are written in _output_.
+    Each generation stops after _max_iter_ iterations or when it converges within _rtol_ (see generate)."""
+    with open(design_yaml) as f:
+        conf = yaml.load(f, Loader=yaml.Loader)
+    design = conf["design"]
+    devices = {"inductor": Inductor, "micro-strip": MicroStrip}
+    if design["device"] not in devices:
+        raise RuntimeError(f"Unknown device, choice are {', '.join(devices)}")
+    specs_grid = {
+        key: val if isinstance(val, list) else [val]
+        for key, val in design["specifications"].items()
+    }
+    results = sweep(
+        devices[design["device"]],
+        specs_grid,
+        conf["techno"],
+        name=conf["name"],
+        dimensions=design.get("dimensions"),
+        stop=Step[stop],
+        max_iter=max_iter,
+        rtol=rtol,
+        workers=workers,
+    )
+    results.to_csv(output, index=False)
+    logging.info(f"Sweep results written in {output}")
 
 
 @app.command(name="run")
@@ -68,7 +128,7 @@ def run_cli(design_py: str = "design", sub_folder: str = ""):
     )
     os.mkdir(run_dir)
     os.chdir(run_dir)
-    layerstack = LayerStack(design.techno)
+    layerstack = LayerStack.for_techno(design.techno)
     lib = db.Layout()
     lib.dbu = layerstack.grid * 1e6
     design.layout(lib.create_cell("ms"), layerstack)
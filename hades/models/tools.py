@@ -32,29 +32,30 @@ def norm_diff(a: float, b: float, /) -> float:
     return abs(a - b) / (abs(a) + abs(b))
 
 
-def eng(x: float, precision: int = 3, prefix: bool = True) -> str:
+# prefix letters of the powers of 1000, from 1e-15 (index 0) to 1e12
+ENG_PREFIX = np.array(["f", "p", "n", "µ", "m", "", "k", "M", "G", "T"])
+
+
+def eng(
+    x: float | np.ndarray, precision: int = 3, prefix: bool = True
+) -> str | np.ndarray:
     """
     Convert a number to engineer notation (notation with an exponent multiple of 3).
-    :param x: number to convert
+    :param x: number to convert. If an array is given, all its numbers are converted at once.
     :param precision: after comma digit number.
     :param prefix: If True, return number with prefix letters (fe: 1.3 p).
         If False, return number with exponent (fe: 1.3e3).
-    :return: string representing the number
+    :return: string representing the number (array of strings if x is an array)
     """
-    pw = int(np.log10(np.abs(x)) // 3)
+    x = np.asarray(x, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pw = np.floor_divide(np.log10(np.abs(x)), 3)
+    pw = np.where(x == 0, 0, pw).astype(int)
+    mantissa = np.char.mod(f"%.{precision}f", x * 10.0 ** (-3 * pw))
     if prefix:
-        ref = {
-            -5: "f",
-            -4: "p",
-            -3: "n",
-            -2: "µ",
-            -1: "m",
-            0: "",
-            1: "k",
-            2: "M",
-            3: "G",
-            4: "T",
-        }
-        return f"{x * 10 ** (-3 * pw):.{precision}f} {ref[pw]}"
+        if np.any((pw < -5) | (pw > 4)):
+            raise KeyError(f"No prefix for {x[(pw < -5) | (pw > 4)]}")
+        res = np.char.add(np.char.add(mantissa, " "), ENG_PREFIX[pw + 5])
     else:
-        return f"{x * 10 ** (-3 * pw):.{precision}f}e{3 * pw}"
+        res = np.char.add(np.char.add(mantissa, "e"), (3 * pw).astype(str))
+    return res.item() if res.ndim == 0 else res
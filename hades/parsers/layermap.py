@@ -1,6 +1,6 @@
 from dataclasses import dataclass
 from os.path import dirname, isabs, join
-from hades.parsers.tools import parse
+from hades.parsers.tools import parse_cached
 from lark import Transformer
 
 from hades.techno import load_pdk
@@ -59,8 +59,7 @@ def load_map(techno: str) -> dict[str, Map]:
         map_path = join(pdk["base_dir"], pdk["layermap"])
     else:
         map_path = join(dirname(dirname(__file__)), pdk["base_dir"], pdk["layermap"])
-    t = parse(map_path, "layermap")
-    map_list = LayerMap().transform(t)
+    map_list = parse_cached(map_path, "layermap", LayerMap().transform)
     return map_list
 
 
@@ -1,4 +1,10 @@
 from dataclasses import dataclass, field
+from io import StringIO
+from pathlib import Path
+from typing import Iterable, TextIO
+
+import numpy as np
+
 from hades.models.tools import eng
 from enum import Enum, auto
 import skrf as rf
@@ -17,15 +23,16 @@ class ComponentType(Enum):
 Unit = {"L": "H", "C": "F", "V": "V", "I": "A", "R": "Ω", "T": "rad", "K": ""}
 
 
-@dataclass
+@dataclass(slots=True)
 class Component:
     """
     Represents a component.
+    The value can be the name of a parameter of the netlist, given as a string.
     """
 
     type: ComponentType
     name: str
-    value: float
+    value: float | str
     node: tuple[str, str]
 
     def __repr__(self) -> str:
@@ -33,8 +40,18 @@ class Component:
         return f"{self.full_name()} {self.node[0]} {self.node[1]} {value}"
 
     def readable_value(self) -> str:
+        if isinstance(self.value, str):
+            return f"{{{self.value}}}"
         return f"{eng(self.value)}{Unit[self.type]}"
 
+    def spice_value(self) -> str:
+        """
+        Value in spice syntax: the number or the parameter expression.
+        """
+        if isinstance(self.value, str):
+            return f"{{{self.value}}}"
+        return repr(float(self.value))
+
     def full_name(self):
         return str(self.type) + self.name
 
@@ -65,12 +82,419 @@ class Netlist:
 
     name: str
     circuit: list[Component] = field(default_factory=list)
+    params: dict[str, float] = field(default_factory=dict)
 
     def append(self, other: Component):
         self.circuit.append(other)
 
     def spice(self):
-        spice = f"#{self.name}\n"
-        for comp in self.circuit:
-            spice += f"{comp}\n"
-        return spice
+        buffer = StringIO()
+        self.write(buffer)
+        return buffer.getvalue()
+
+    def write(self, file: str | Path | TextIO, chunk_size: int = 100_000) -> None:
+        """
+        Write the spice netlist (as given by spice) in _file_.
+        Components are formatted and written by chunks of _chunk_size_.
+        :param file: path or text stream of the output.
+        :param chunk_size: number of components written at once.
+        """
+        if not hasattr(file, "write"):
+            with open(file, "w", encoding="utf-8") as f:
+                return self.write(f, chunk_size)
+        file.write(f"#{self.name}\n")
+        for i in range(0, len(self.circuit), chunk_size):
+            chunk = self.circuit[i : i + chunk_size]
+            numbers = [c.value for c in chunk if not isinstance(c.value, str)]
+            numbers = iter(eng(np.array(numbers, dtype=float), precision=3))
+            file.write(
+                "".join(
+                    f"{c.full_name()} {c.node[0]} {c.node[1]} {c.readable_value()}\n"
+                    if isinstance(c.value, str)
+                    else f"{c.full_name()} {c.node[0]} {c.node[1]} {next(numbers)}{Unit[c.type]}\n"
+                    for c in chunk
+                )
+            )
+
+    def to_network(self, frequency: rf.Frequency, z0: float = 50) -> rf.Network:
+        """
+        Return the two-port network of the cascade of the R, L and C components, in the netlist order.
+        As in Component.network, components connected to "0" are in shunt, the others in series.
+        The ABCD matrices of all the components are computed at once and multiplied pairwise.
+        :param frequency: frequencies of the network.
+        :param z0: reference impedance of the ports.
+        :return: the network.
+        """
+        if any(isinstance(c.value, str) for c in self.circuit):
+            raise ValueError("Parameter values are not supported, set a value first.")
+        types = np.array([c.type for c in self.circuit], dtype=str)
+        values = np.array([c.value for c in self.circuit], dtype=float)
+        shunt = np.array(["0" in c.node for c in self.circuit], dtype=bool)
+        return _cascade(types, values, shunt, frequency, z0, self.name)
+
+    def _parameters(self) -> set[str]:
+        # names of the parameters used by the components
+        return {c.value for c in self.circuit if isinstance(c.value, str)}
+
+    def _spice_lines(self) -> Iterable[str]:
+        # components in ngspice syntax
+        for c in self.circuit:
+            yield f"{c.full_name()} {c.node[0]} {c.node[1]} {c.spice_value()}"
+
+    def ngspice(
+        self, params: dict[str, float] = None, control: list[str] = None
+    ) -> str:
+        """
+        Return the netlist in ngspice syntax. Components valued by a parameter use a .param statement.
+        :param params: values of the parameters, overriding the ones of the netlist.
+        :param control: commands of the .control section (e.g.: ["tran 1n 100n"]).
+        :return: the ngspice netlist.
+        """
+        values = _resolve_params(self.params, params, self._parameters())
+        return _ngspice_deck(self.name, values, self._spice_lines(), control)
+
+
+def _resolve_params(
+    defaults: dict[str, float], params: dict[str, float] | None, used: set[str]
+) -> dict[str, float]:
+    # values of the parameters, _params_ overriding _defaults_
+    values = dict(defaults, **(params or {}))
+    missing = used - values.keys()
+    if missing:
+        raise KeyError(f"No value given for the parameters {missing}")
+    return values
+
+
+def _ngspice_deck(
+    name: str, values: dict[str, float], lines: Iterable[str], control: list[str]
+) -> str:
+    # ngspice input: title, parameters, components and control section
+    deck = [f"* {name}"]
+    deck += [f".param {key}={float(val)!r}" for key, val in values.items()]
+    deck += lines
+    if control is not None:
+        deck += [".control", *control, ".endc"]
+    deck.append(".end")
+    return "\n".join(deck) + "\n"
+
+
+def _cascade(
+    types: np.ndarray,
+    values: np.ndarray,
+    shunt: np.ndarray,
+    frequency: rf.Frequency,
+    z0: float,
+    name: str,
+) -> rf.Network:
+    """
+    Return the network of the cascade of R, L and C components (see Netlist.to_network).
+    :param types: type names of the components.
+    :param values: values of the components.
+    :param shunt: True for the components in shunt, False for the ones in series.
+    """
+    if np.isin(types, ("R", "L", "C"), invert=True).any():
+        raise ValueError("Unsupported type of components.")
+    values, shunt = values[:, None], shunt[:, None]
+    jw = 1j * frequency.w
+    with np.errstate(divide="ignore"):
+        z = np.where(
+            (types == "R")[:, None],
+            values,
+            np.where((types == "L")[:, None], jw * values, 1 / (jw * values)),
+        )
+        # ABCD matrices of the components: series [[1, z], [0, 1]], shunt [[1, 0], [1/z, 1]]
+        one = np.ones_like(z)
+        abcd = (one, np.where(shunt, 0, z), np.where(shunt, 1 / z, 0), one)
+    # pairwise products, the number of matrices is halved at each step
+    identity = (1, 0, 0, 1)
+    while len(abcd[0]) != 1:
+        if len(abcd[0]) % 2 or len(abcd[0]) == 0:
+            abcd = tuple(
+                np.concatenate((m, np.full((1, len(jw)), i, dtype=m.dtype)))
+                for m, i in zip(abcd, identity)
+            )
+            continue
+        a1, b1, c1, d1 = (m[0::2] for m in abcd)
+        a2, b2, c2, d2 = (m[1::2] for m in abcd)
+        abcd = (
+            a1 * a2 + b1 * c2,
+            a1 * b2 + b1 * d2,
+            c1 * a2 + d1 * c2,
+            c1 * b2 + d1 * d2,
+        )
+    a, b, c, d = (m[0] for m in abcd)
+    abcd = np.stack((np.stack((a, b), -1), np.stack((c, d), -1)), -2)
+    return rf.Network(frequency=frequency, s=rf.network.a2s(abcd, z0), z0=z0, name=name)
+
+
+# columns of ColumnarNetlist.types are the values of ComponentType
+_TYPE_NAMES = np.array([""] + [t.name for t in ComponentType])
+_TYPE_UNITS = np.array([""] + [Unit[t.name] for t in ComponentType])
+_TYPE_CODES = {t.name: t.value for t in ComponentType} | {
+    t: t.value for t in ComponentType
+}
+
+
+class ColumnarNetlist:
+    """
+    Netlist stored by columns: numpy arrays of type codes (ComponentType values),
+    names, values and node ids, the node names being stored once in node_names.
+    It has the interface of Netlist (append, circuit, spice, write, ngspice) and is more compact
+    and faster to query for large netlists such as extracted parasitics.
+    Components valued by a parameter have a value of 0, their parameter is given by param_ids
+    (index in param_names, -1 for the components with a numerical value).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        circuit: Iterable[Component] = (),
+        params: dict[str, float] = None,
+    ):
+        self.name = name
+        self.params = dict(params or {})
+        self.node_names: list[str] = []
+        self._node_ids: dict[str, int] = {}
+        self.param_names: list[str] = []
+        self._param_ids: dict[str, int] = {}
+        self._types = np.empty(0, np.int8)
+        self._names = np.empty(0, str)
+        self._values = np.empty(0, float)
+        self._params = np.empty(0, np.int32)
+        self._nodes = np.empty((0, 2), np.int32)
+        # appended components not yet in the arrays
+        self._pending: list[tuple[int, float, int, int, int]] = []
+        self._pending_names: list[str] = []
+        self.extend(circuit)
+
+    def _node_id(self, node: str) -> int:
+        if node not in self._node_ids:
+            self._node_ids[node] = len(self.node_names)
+            self.node_names.append(node)
+        return self._node_ids[node]
+
+    def _param_id(self, param: str) -> int:
+        if param not in self._param_ids:
+            self._param_ids[param] = len(self.param_names)
+            self.param_names.append(param)
+        return self._param_ids[param]
+
+    def append(self, other: Component):
+        if isinstance(other.value, str):
+            value, param = 0.0, self._param_id(other.value)
+        else:
+            value, param = other.value, -1
+        ids = self._node_ids
+        n0, n1 = other.node
+        self._pending.append(
+            (
+                _TYPE_CODES[other.type],
+                value,
+                param,
+                ids[n0] if n0 in ids else self._node_id(n0),
+                ids[n1] if n1 in ids else self._node_id(n1),
+            )
+        )
+        self._pending_names.append(other.name)
+
+    def extend(self, components: Iterable[Component]):
+        for comp in components:
+            self.append(comp)
+
+    def _flush(self):
+        if self._pending:
+            pending = np.array(self._pending, dtype=float)
+            self._types = np.concatenate((self._types, pending[:, 0].astype(np.int8)))
+            self._values = np.concatenate((self._values, pending[:, 1]))
+            self._params = np.concatenate(
+                (self._params, pending[:, 2].astype(np.int32))
+            )
+            self._nodes = np.concatenate((self._nodes, pending[:, 3:].astype(np.int32)))
+            self._names = np.concatenate((self._names, self._pending_names))
+            self._pending = []
+            self._pending_names = []
+
+    @property
+    def types(self) -> np.ndarray:
+        self._flush()
+        return self._types
+
+    @property
+    def names(self) -> np.ndarray:
+        self._flush()
+        return self._names
+
+    @property
+    def values(self) -> np.ndarray:
+        self._flush()
+        return self._values
+
+    @property
+    def param_ids(self) -> np.ndarray:
+        """
+        Parameter of the components (index in param_names), -1 for the ones with a numerical value.
+        """
+        self._flush()
+        return self._params
+
+    @property
+    def nodes(self) -> np.ndarray:
+        """
+        Node ids of the components (one row per component), see node_names.
+        """
+        self._flush()
+        return self._nodes
+
+    def __len__(self) -> int:
+        return len(self._types) + len(self._pending)
+
+    def component(self, index: int) -> Component:
+        n0, n1 = self.nodes[index]
+        param = self.param_ids[index]
+        return Component(
+            str(_TYPE_NAMES[self.types[index]]),
+            str(self.names[index]),
+            self.param_names[param] if param >= 0 else float(self.values[index]),
+            (self.node_names[n0], self.node_names[n1]),
+        )
+
+    @property
+    def circuit(self) -> list[Component]:
+        return [self.component(i) for i in range(len(self))]
+
+    def node_id(self, node: str) -> int:
+        try:
+            return self._node_ids[node]
+        except KeyError:
+            raise KeyError(f"Node {node} not found in {self.name}")
+
+    def select(
+        self, type: str = None, node: str = None, between: tuple[str, str] = None
+    ) -> np.ndarray:
+        """
+        Return the indexes of the components matching all the given criteria.
+        :param type: type of the components (e.g.: "R").
+        :param node: node connected to the components.
+        :param between: the two nodes of the components (in any order).
+        :return: the indexes of the components.
+        """
+        mask = np.ones(len(self), bool)
+        if type is not None:
+            mask &= self.types == ComponentType[type].value
+        if node is not None:
+            mask &= (self.nodes == self.node_id(node)).any(axis=1)
+        if between is not None:
+            n0, n1 = self.node_id(between[0]), self.node_id(between[1])
+            mask &= ((self.nodes[:, 0] == n0) & (self.nodes[:, 1] == n1)) | (
+                (self.nodes[:, 0] == n1) & (self.nodes[:, 1] == n0)
+            )
+        return np.flatnonzero(mask)
+
+    def parameter_values(self, params: dict[str, float] = None) -> np.ndarray:
+        """
+        Return the values of the components, the ones valued by a parameter being replaced by its value.
+        :param params: values of the parameters, overriding the ones of the netlist.
+        :return: the values.
+        """
+        values = _resolve_params(self.params, params, self._parameters())
+        res = self.values.copy()
+        mask = self.param_ids >= 0
+        if mask.any():
+            lookup = np.array([values[p] for p in self.param_names], dtype=float)
+            res[mask] = lookup[self.param_ids[mask]]
+        return res
+
+    def total(self, type: str, node: str, params: dict[str, float] = None) -> float:
+        """
+        Return the sum of the values of the components of _type_ connected to _node_
+        (e.g.: total("C", "out") is the capacitance to the node out).
+        Parameters are replaced by their value (see parameter_values).
+        """
+        idx = self.select(type, node)
+        if (self.param_ids[idx] >= 0).any():
+            return float(self.parameter_values(params)[idx].sum())
+        return float(self.values[idx].sum())
+
+    def to_network(self, frequency: rf.Frequency, z0: float = 50) -> rf.Network:
+        """
+        Return the two-port network of the cascade of the R, L and C components (see Netlist.to_network).
+        """
+        if (self.param_ids >= 0).any():
+            raise ValueError("Parameter values are not supported, set a value first.")
+        if "0" in self._node_ids:
+            shunt = (self.nodes == self._node_ids["0"]).any(axis=1)
+        else:
+            shunt = np.zeros(len(self), bool)
+        types = _TYPE_NAMES[self.types]
+        return _cascade(types, self.values, shunt, frequency, z0, self.name)
+
+    def _parameters(self) -> set[str]:
+        return set(self.param_names)
+
+    def _spice_lines(self) -> Iterable[str]:
+        node_names = np.array(self.node_names, dtype=str)
+        types = _TYPE_NAMES[self.types].tolist()
+        nodes = node_names[self.nodes]
+        values = [repr(v) for v in self.values.tolist()]
+        params = self.param_ids
+        for i in np.flatnonzero(params >= 0):
+            values[i] = f"{{{self.param_names[params[i]]}}}"
+        for t, name, n0, n1, v in zip(
+            types,
+            self.names.tolist(),
+            nodes[:, 0].tolist(),
+            nodes[:, 1].tolist(),
+            values,
+        ):
+            yield f"{t}{name} {n0} {n1} {v}"
+
+    def spice(self) -> str:
+        buffer = StringIO()
+        self.write(buffer)
+        return buffer.getvalue()
+
+    def write(self, file: str | Path | TextIO, chunk_size: int = 100_000) -> None:
+        """
+        Write the spice netlist (as given by spice) in _file_.
+        :param file: path or text stream of the output.
+        :param chunk_size: number of components written at once.
+        """
+        if not hasattr(file, "write"):
+            with open(file, "w", encoding="utf-8") as f:
+                return self.write(f, chunk_size)
+        file.write(f"#{self.name}\n")
+        node_names = np.array(self.node_names, dtype=str)
+        for i in range(0, len(self), chunk_size):
+            types = self.types[i : i + chunk_size]
+            values = self.values[i : i + chunk_size]
+            params = self.param_ids[i : i + chunk_size]
+            nodes = node_names[self.nodes[i : i + chunk_size]]
+            known = params < 0
+            text = np.empty(len(values), dtype=object)
+            text[known] = np.char.add(eng(values[known]), _TYPE_UNITS[types[known]])
+            for j in np.flatnonzero(~known):
+                text[j] = f"{{{self.param_names[params[j]]}}}"
+            file.write(
+                "".join(
+                    f"{t}{name} {n0} {n1} {v}\n"
+                    for t, name, n0, n1, v in zip(
+                        _TYPE_NAMES[types].tolist(),
+                        self.names[i : i + chunk_size].tolist(),
+                        nodes[:, 0].tolist(),
+                        nodes[:, 1].tolist(),
+                        text.tolist(),
+                    )
+                )
+            )
+
+    def ngspice(
+        self, params: dict[str, float] = None, control: list[str] = None
+    ) -> str:
+        """
+        Return the netlist in ngspice syntax (see Netlist.ngspice).
+        :param params: values of the parameters, overriding the ones of the netlist.
+        :param control: commands of the .control section (e.g.: ["tran 1n 100n"]).
+        :return: the ngspice netlist.
+        """
+        values = _resolve_params(self.params, params, self._parameters())
+        return _ngspice_deck(self.name, values, self._spice_lines(), control)
@@ -3,7 +3,7 @@ import logging
 from pathlib import Path
 from lark import Transformer
 
-from hades.parsers.tools import parse
+from hades.parsers.tools import parse_cached
 
 
 @dataclasses.dataclass
@@ -113,5 +113,4 @@ class Process(Transformer):
 
 
 def layer_stack(proc_file: Path):
-    t = parse(proc_file, "process")
-    return Process().transform(t)
+    return parse_cached(proc_file, "process", lambda t: Process().transform(t))
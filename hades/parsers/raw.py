@@ -1,22 +1,342 @@
-import pandas as pd
+import re
+import warnings
+from dataclasses import dataclass, field
+from itertools import islice
 from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator, TextIO
+
+import numpy as np
+import pandas as pd
+
+
+def _rows(f: TextIO, headers: list[str]) -> Iterator[str]:
+    """
+    Yield the data lines of the tables whose header is _headers_.
+    Tables are printed in pages separated by a title and the header; any other text line ends the table,
+    as well as the index restarting from 0 (another table with the same vectors).
+    """
+    active = True
+    started = False
+    for line in f:
+        c = line[:1]
+        if c.isdigit():
+            if active:
+                if started and line.split(None, 1)[0] == "0":
+                    return
+                started = True
+                yield line
+        elif c.isalpha():
+            active = line.startswith("Index") and line.split() == headers
+
+
+def _load(rows: Iterable[str], headers: list[str], idx: list[int] = None) -> np.ndarray:
+    # only the selected columns are parsed, the first one (index of the point) is skipped
+    if idx is None:
+        idx = range(len(headers) - 1)
+    usecols = [i + 1 for i in idx]
+    if not usecols:
+        return np.empty((0, 0))
+    with warnings.catch_warnings():
+        # an empty table is not an error
+        warnings.simplefilter("ignore", UserWarning)
+        data = np.loadtxt(rows, ndmin=2, usecols=usecols)
+    return data.reshape(-1, len(usecols))
+
+
+def _headers(f: TextIO) -> list[str] | None:
+    # move the file after the header of the first table
+    for line in f:
+        if line.startswith("Index"):
+            return line.split()
+    return None
 
 
-def parse_raw(results: Path) -> pd.DataFrame:
-    data = dict()
+def _columns(headers: list[str], columns: list[str] | None) -> list[int]:
+    # position of the selected columns in the data (without the index)
+    if columns is None:
+        return list(range(len(headers) - 1))
+    missing = set(columns) - set(headers[1:])
+    if missing:
+        raise KeyError(f"{missing} not found. Available vectors are {headers[1:]}")
+    return [headers.index(c) - 1 for c in columns]
+
+
+def parse_raw(results: Path, columns: list[str] = None) -> pd.DataFrame:
+    """
+    Read the tables printed by ngspice (print command in batch mode).
+    Only the vectors of the first table are returned (see load_plots to read all of them).
+    :param results: path to the ngspice output.
+    :param columns: names of the vectors to return (all by default).
+    :return: a table with one column per printed vector.
+    """
+    with open(results, "r") as f:
+        headers = _headers(f)
+        if headers is None:
+            return pd.DataFrame(dtype=float)
+        idx = _columns(headers, columns)
+        data = _load(_rows(f, headers), headers, idx)
+    return pd.DataFrame(data=data, columns=[headers[i + 1] for i in idx], dtype=float)
+
+
+def iter_raw(
+    results: Path, chunk_size: int = 100_000, columns: list[str] = None
+) -> Iterator[pd.DataFrame]:
+    """
+    Read the first table printed by ngspice by chunks of _chunk_size_ points.
+    Only one chunk is in memory at a time, which allows processing results larger than the memory.
+    :param results: path to the ngspice output.
+    :param chunk_size: number of points per chunk.
+    :param columns: names of the vectors to return (all by default).
+    :return: an iterator over the chunks, each chunk being a table with one column per vector.
+    """
     with open(results, "r") as f:
-        for line in f.readlines():
-            match line.split():
-                case "Index", *k:
-                    if "headers" not in locals():
-                        headers = line.split()
-                case [ind, *k] if "headers" in locals() and len(k) == len(headers) - 1:
-                    for head, val in zip(headers, k):
-                        if head not in data.keys():
-                            data[head] = [
-                                float(val),
-                            ]
-                        else:
-                            data[head].append(float(val))
-    df = pd.DataFrame(data=data, dtype=float)
-    return df
+        headers = _headers(f)
+        if headers is None:
+            return
+        idx = _columns(headers, columns)
+        names = [headers[i + 1] for i in idx]
+        rows = _rows(f, headers)
+        while chunk := list(islice(rows, chunk_size)):
+            data = _load(chunk, headers, idx)
+            yield pd.DataFrame(data=data, columns=names, dtype=float)
+
+
+# analysis type (as used in ngspice plot names) of the plot names
+ANALYSES = {
+    "Operating Point": "op",
+    "AC Analysis": "ac",
+    "DC transfer characteristic": "dc",
+    "Transient Analysis": "tran",
+    "Noise Spectral Density Curves": "noise",
+    "Integrated Noise": "noise",
+    "Transfer Function": "tf",
+    "Pole-Zero Analysis": "pz",
+    "Sensitivity Analysis": "sens",
+    "Distortion Analysis": "disto",
+    "S-Parameter Analysis": "sp",
+}
+
+
+@dataclass
+class RawPlot:
+    """
+    A plot of a ngspice rawfile.
+    :param title: title of the circuit.
+    :param name: name of the plot (analysis).
+    :param flags: flags of the plot ("real" or "complex").
+    :param variables: names of the vectors.
+    :param units: type of the vectors (time, voltage, current...).
+    :param data: values of the vectors, one column per vector.
+        For binary files, it is a read only memory map of the file.
+    """
+
+    title: str
+    name: str
+    flags: str
+    variables: list[str]
+    units: list[str]
+    data: np.ndarray = field(repr=False)
+
+    @property
+    def is_complex(self) -> bool:
+        return "complex" in self.flags
+
+    @property
+    def analysis(self) -> str:
+        """
+        Type of the analysis (op, ac, dc, tran...).
+        """
+        for name, analysis in ANALYSES.items():
+            if self.name.startswith(name):
+                return analysis
+        return self.name.split(" ")[0].lower()
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        """
+        Return the values of the vector _name_ (without copy).
+        """
+        try:
+            return self.data[:, self.variables.index(name)]
+        except ValueError:
+            raise KeyError(f"{name} not found in {self.name}: {self.variables}")
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(data=self.data, columns=self.variables)
+
+
+def _read_values(
+    f: BinaryIO, points: int, variables: int, is_complex: bool
+) -> np.ndarray:
+    # ascii values: the index of the point followed by one line per variable
+    lines = []
+    while len(lines) < points * variables:
+        line = f.readline()
+        if not line:
+            raise ValueError(f"Expected {points} points, end of file reached.")
+        if line.strip():
+            lines.append(line)
+    tokens = b" ".join(lines).replace(b",", b" ").split()
+    columns = 2 * variables + 1 if is_complex else variables + 1
+    values = np.array(tokens, dtype=float).reshape(points, columns)[:, 1:]
+    if is_complex:
+        values = values[:, 0::2] + 1j * values[:, 1::2]
+    return values
+
+
+def load_raw(results: Path) -> list[RawPlot]:
+    """
+    Read a ngspice rawfile (written with the write command) in ascii or binary format.
+    Binary data are memory mapped: they are read from the disk only when accessed.
+    :param results: path to the rawfile.
+    :return: the plots of the file.
+    """
+    plots = []
+    header = {}
+    with open(results, "rb") as f:
+        while line := f.readline():
+            key, _, value = line.decode("latin").partition(":")
+            value = value.strip()
+            match key:
+                case "Variables":
+                    nb = int(header["No. Variables"])
+                    var = [f.readline().decode("latin").split() for _ in range(nb)]
+                    header["variables"] = [v[1] for v in var]
+                    header["units"] = [v[2] for v in var]
+                case "Binary" | "Values":
+                    points = int(header["No. Points"])
+                    nb = int(header["No. Variables"])
+                    is_complex = "complex" in header["Flags"]
+                    if key == "Binary" and points * nb > 0:
+                        dtype = np.dtype("<c16" if is_complex else "<f8")
+                        offset = f.tell()
+                        data = np.memmap(
+                            results,
+                            dtype=dtype,
+                            mode="r",
+                            offset=offset,
+                            shape=(points, nb),
+                        )
+                        f.seek(offset + data.nbytes)
+                    elif key == "Binary":
+                        data = np.empty((points, nb), complex if is_complex else float)
+                    else:
+                        data = _read_values(f, points, nb, is_complex)
+                    plots.append(
+                        RawPlot(
+                            title=header.get("Title", ""),
+                            name=header.get("Plotname", ""),
+                            flags=header["Flags"],
+                            variables=header["variables"],
+                            units=header["units"],
+                            data=data,
+                        )
+                    )
+                    header = {}
+                case _ if value:
+                    header[key] = value
+    return plots
+
+
+def _table_data(rows: list[str], headers: list[str]) -> np.ndarray:
+    # complex values are printed as "real,\timag"
+    first = rows[0].split()
+    if not any(t.endswith(",") for t in first):
+        return _load(rows, headers)
+    values = _load([r.replace(",", " ") for r in rows], first)
+    data = np.empty((len(values), len(headers) - 1), complex)
+    k = 0
+    for j in range(data.shape[1]):
+        if first[k + 1].endswith(","):
+            data[:, j] = values[:, k] + 1j * values[:, k + 1]
+            k += 2
+        else:
+            data[:, j] = values[:, k]
+            k += 1
+    return data
+
+
+def _print_tables(f: TextIO) -> list[tuple[str, list[str], list[str]]]:
+    """
+    Return the (plot name, headers, data lines) of all the tables printed by ngspice.
+    The pages of a table are gathered, a new table starts when the index restarts from 0.
+    """
+    tables = []
+    title, headers, rows = "", [], None
+    for line in f:
+        c = line[:1]
+        if c.isdigit():
+            if rows is not None:
+                if rows and line.split(None, 1)[0] == "0":
+                    rows = []
+                    tables.append((title, headers, rows))
+                rows.append(line)
+        elif c in " \t" and line.strip():
+            # the plot name is on the last title line, followed by the date
+            title = re.split(r"\s{2,}", line.strip())[0]
+        elif c.isalpha():
+            rows = None
+            if line.startswith("Index"):
+                headers = line.split()
+                if tables and tables[-1][:2] == (title, headers):
+                    rows = tables[-1][2]
+                else:
+                    rows = []
+                    tables.append((title, headers, rows))
+    return tables
+
+
+def load_plots(results: Path) -> dict[str, RawPlot]:
+    """
+    Read all the plots of a ngspice rawfile or of a ngspice output (print command in batch mode).
+    Plots are named as in ngspice: analysis type followed by its number (op1, ac1, tran1, tran2...).
+    Printed vectors of a same analysis sharing the same scale are gathered in the same plot.
+    :param results: path to the rawfile or the ngspice output.
+    :return: the plots by name.
+    """
+    with open(results, "rb") as f:
+        is_rawfile = f.read(6) == b"Title:"
+    if is_rawfile:
+        plots = load_raw(results)
+    else:
+        plots = []
+        with open(results, "r") as f:
+            tables = _print_tables(f)
+        for name, headers, rows in tables:
+            if not rows:
+                continue
+            data = _table_data(rows, headers)
+            last = plots[-1] if plots else None
+            if (
+                last is not None
+                and last.name == name
+                and last.variables[0] == headers[1]
+                and len(last.data) == len(data)
+            ):
+                # wide tables are printed as several tables with the same scale,
+                # a table with the same vectors is another analysis
+                twice = [v for v in headers[2:] if v in last.variables]
+                if not twice:
+                    last.variables += headers[2:]
+                    last.units += ["" for _ in headers[2:]]
+                    last.data = np.hstack((last.data, data[:, 1:]))
+                    if np.iscomplexobj(data):
+                        last.flags = "complex"
+                    continue
+                if len(twice) < len(headers) - 2:
+                    raise ValueError(f"Vectors {twice} printed twice in {name}.")
+            plots.append(
+                RawPlot(
+                    title="",
+                    name=name,
+                    flags="complex" if np.iscomplexobj(data) else "real",
+                    variables=headers[1:],
+                    units=["" for _ in headers[1:]],
+                    data=data,
+                )
+            )
+    res = {}
+    count = {}
+    for plot in plots:
+        count[plot.analysis] = count.get(plot.analysis, 0) + 1
+        res[f"{plot.analysis}{count[plot.analysis]}"] = plot
+    return res
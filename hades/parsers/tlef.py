@@ -7,7 +7,7 @@ import dataclasses
 import logging
 from enum import Enum
 from pathlib import Path
-from .tools import parse
+from .tools import parse_cached
 from lark import Discard, Transformer
 
 
@@ -103,10 +103,10 @@ class TechLef(Transformer):
 def load_tlef(tlef_path: str | Path) -> TechStack:
     """
     Load a TLEF file and return a dictionary of layer names.
+    The result is cached on disk until the file is modified.
     :param tlef_path: path to the TLEF file
     """
-    t = parse(tlef_path, "tlef")
-    return TechLef().transform(t)
+    return parse_cached(tlef_path, "tlef", TechLef().transform)
 
 
 def get_all_by_type(l_type: str, tlef_path: Path) -> list[str]:
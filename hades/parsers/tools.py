@@ -2,16 +2,115 @@
 This package give general tools to help parse file with lark.
 """
 
+import inspect
+import logging
+import os
+import pickle
+from functools import cache
+from hashlib import sha256
 from pathlib import Path
+from typing import Callable, TypeVar
 
 from lark import Lark, Tree
+from lark.exceptions import GrammarError
 from os.path import join, dirname
 
+CACHE_DIR = Path(os.environ.get("HADES_CACHE", Path.home() / ".cache" / "hades"))
 
-def parse(file: str | Path, template: str = "spice") -> Tree:
+T = TypeVar("T")
+
+
+@cache
+def get_parser(template: str = "spice", parser: str = "earley") -> Lark:
+    """
+    Return the parser compiled from the _template_.lark grammar.
+    Parsers are built once per process and shared between calls.
+    LALR parsers are also serialized in CACHE_DIR to be reused across runs.
+    :param template: name of the grammar (without the .lark extension).
+    :param parser: parsing algorithm to be used by lark ("earley" or "lalr").
+        "auto" tries LALR first and falls back to Earley if the grammar has conflicts.
+    :return: the compiled parser.
+    """
+    if parser == "auto":
+        try:
+            return get_parser(template, "lalr")
+        except GrammarError as e:
+            logging.warning(f"{template} grammar is not LALR, using Earley: {e}")
+            return get_parser(template, "earley")
     tpt_file = join(dirname(__file__), template + ".lark")
+    options = {"parser": parser}
+    if parser == "lalr":
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            options["cache"] = str(CACHE_DIR / f"{template}.lalr")
+        except OSError as e:
+            logging.warning(f"Grammar cache disabled: {e}")
+    logging.debug(f"Compiling {template} grammar with {parser} parser.")
     with open(tpt_file, "r") as f:
-        spice_parser = Lark(f)
+        return Lark(f, **options)
+
+
+def parse(file: str | Path, template: str = "spice", parser: str = "earley") -> Tree:
     with open(file) as f:
-        t = spice_parser.parse(f.read())
+        t = get_parser(template, parser).parse(f.read())
     return t
+
+
+def _module_source(transform: Callable) -> bytes:
+    """
+    Return the source of the module defining _transform_ (the class of a bound method),
+    so that cache entries are invalidated when the transformer or its dataclasses change.
+    """
+    module = inspect.getmodule(getattr(transform, "__self__", transform))
+    try:
+        return inspect.getsource(module).encode()
+    except (TypeError, OSError):
+        return b""
+
+
+def parse_cached(
+    file: str | Path,
+    template: str,
+    transform: Callable[[Tree], T],
+    parser: str = "auto",
+) -> T:
+    """
+    Parse _file_ and apply _transform_ to the tree. The result is pickled in CACHE_DIR
+    and reloaded as long as the file path, its modification time and its content
+    (as well as the grammar and the module of the transformer) are unchanged.
+    :param file: path of the file to parse.
+    :param template: name of the grammar (without the .lark extension).
+    :param transform: function building the returned object from the parsed tree.
+    :param parser: parsing algorithm (see get_parser).
+    :return: the transformed object.
+    """
+    file = Path(file).resolve()
+    tpt_file = join(dirname(__file__), template + ".lark")
+    key = sha256(f"{file}|{file.stat().st_mtime_ns}|{parser}".encode())
+    with open(file, "rb") as f:
+        key.update(f.read())
+    with open(tpt_file, "rb") as f:
+        key.update(f.read())
+    key.update(_module_source(transform))
+    prefix = f"{template}-{sha256(str(file).encode()).hexdigest()[:16]}"
+    cache_file = CACHE_DIR / f"{prefix}-{key.hexdigest()[:16]}.pickle"
+    try:
+        with open(cache_file, "rb") as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logging.warning(f"Invalid cache entry {cache_file}: {e}")
+    res = transform(parse(file, template, parser))
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        # remove the entries of the previous versions of the file
+        for old in CACHE_DIR.glob(prefix + "-*.pickle"):
+            old.unlink(missing_ok=True)
+        tmp_file = cache_file.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_file, "wb") as f:
+            pickle.dump(res, f)
+        os.replace(tmp_file, cache_file)
+    except OSError as e:
+        logging.warning(f"Unable to write cache entry {cache_file}: {e}")
+    return res
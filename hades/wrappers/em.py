@@ -1,17 +1,22 @@
 import logging
+import os
 from pathlib import Path
 
 import numpy as np
 import skrf as rf
 from .simulator import load_conf
+from .tools import FileCache, run_async
 from ..layouts.tools import Port
-from subprocess import run
+from ..parsers.tools import CACHE_DIR
+from subprocess import run, CompletedProcess
 from os.path import join
 from dotenv import load_dotenv
 from ..techno import load_pdk
 import glob
 from typing import Optional
 
+EMX_CACHE = FileCache(CACHE_DIR / "emx")
+
 
 class Emx:
     """
@@ -31,27 +36,17 @@ class Emx:
         tech = load_pdk(techno)
         self.proc = join(tech["base_dir"], tech["process"])
 
-    def compute(
+    def _prepare(
         self,
         input_file: Path,
         cell_name: str,
         freq: float | tuple[float],
-        ports: Optional[list[Port | str]] = None,
-        **options,
-    ):
+        ports: Optional[list[Port | str]],
+        work_dir: Path,
+        options: dict,
+    ) -> tuple[list[str], str]:
         """
-        Run the simulation
-        :param ports: list of ports to be used in simulation. Ports name and ref must be labels in the layout.
-            If ports are not given, all the ports in the layout will be used.
-            If ports are given, the simulation will be done only on the given ports. Remaining ports will be grounded.
-        :param input_file: gds file to be simulated.
-        :param cell_name: name of the cell to simulate.
-        :param freq: simulation frequency.
-            - If one frequency is given, simulate from 0 to the given frequency.
-            - If two frequencies are given, simulate in-between the two frequencies.
-            - If more frequencies are given, simulate only at the given frequencies.
-        :param options:
-        :return: Scikit RF data structure.
+        Return the EMX command and its cache key.
         """
         if isinstance(freq, float):
             f_s = [
@@ -65,7 +60,7 @@ class Emx:
         except KeyError:
             raise KeyError(f"key not found in {conf.keys()}")
         # %d enable automatic numbering matching the port number
-        path_file = "res.s%dp"
+        path_file = str(Path(work_dir) / "res.s%dp")
         cmd = (
             [
                 emx_base,
@@ -97,16 +92,99 @@ class Emx:
         for c in cmd:
             exp += f"{c} "
         logging.debug(exp)
-        proc = run(cmd + conf["options"], capture_output=True, encoding="latin")
+        cache_key = EMX_CACHE.key(
+            emx_base,
+            Path(input_file),
+            cell_name,
+            Path(self.proc) if Path(self.proc).is_file() else self.proc,
+            # the result location does not change the result
+            *(c if c != "-s" + path_file else "-sres.s%dp" for c in cmd[4:]),
+            *conf["options"],
+        )
+        return cmd + conf["options"], cache_key
+
+    @staticmethod
+    def _load(
+        proc: CompletedProcess,
+        ports: Optional[list[Port | str]],
+        work_dir: Path,
+        cache_key: str,
+    ) -> rf.Network:
+        """
+        Check the EMX run and load its result.
+        """
         if proc.returncode != 0:
-            RuntimeWarning(str(cmd + conf["options"]))
+            RuntimeWarning(str(proc.args))
             raise RuntimeError(proc.stderr)
         # get back the real name.
         nw = str(len(ports)) if ports is not None else "[0-9]"
-        res_path = glob.glob(path_file.replace("%d", nw))
+        res_path = glob.glob(str(Path(work_dir) / ("res.s" + nw + "p")))
         y_param = rf.Network(res_path[0])
+        EMX_CACHE.put(cache_key, Path(res_path[0]))
         return y_param
 
+    def compute(
+        self,
+        input_file: Path,
+        cell_name: str,
+        freq: float | tuple[float],
+        ports: Optional[list[Port | str]] = None,
+        use_cache: bool = True,
+        **options,
+    ):
+        """
+        Run the simulation
+        :param ports: list of ports to be used in simulation. Ports name and ref must be labels in the layout.
+            If ports are not given, all the ports in the layout will be used.
+            If ports are given, the simulation will be done only on the given ports. Remaining ports will be grounded.
+        :param input_file: gds file to be simulated.
+        :param cell_name: name of the cell to simulate.
+        :param freq: simulation frequency.
+            - If one frequency is given, simulate from 0 to the given frequency.
+            - If two frequencies are given, simulate in-between the two frequencies.
+            - If more frequencies are given, simulate only at the given frequencies.
+        :param use_cache: if True, a previous result is returned when the layout, the process,
+            the ports, the frequencies and the options are the same (see EMX_CACHE).
+        :param options:
+        :return: Scikit RF data structure.
+        """
+        cmd, cache_key = self._prepare(
+            input_file, cell_name, freq, ports, Path("."), options
+        )
+        if use_cache and (res_file := EMX_CACHE.get(cache_key)) is not None:
+            logging.info(f"EMX result found in cache: {res_file}")
+            return rf.Network(str(res_file))
+        proc = run(cmd, capture_output=True, encoding="latin")
+        return self._load(proc, ports, Path("."), cache_key)
+
+    async def compute_async(
+        self,
+        input_file: Path,
+        cell_name: str,
+        freq: float | tuple[float],
+        ports: Optional[list[Port | str]] = None,
+        use_cache: bool = True,
+        work_dir: Path = Path("."),
+        timeout: Optional[float] = None,
+        **options,
+    ) -> rf.Network:
+        """
+        Asynchronous version of compute, the simulation is run with run_async.
+        Simulations running at the same time must use different _work_dir_.
+        :param work_dir: directory where the results of the simulation are written.
+        :param timeout: maximum duration of the simulation in seconds.
+        :return: Scikit RF data structure.
+        """
+        cmd, cache_key = self._prepare(
+            input_file, cell_name, freq, ports, work_dir, options
+        )
+        if use_cache and (res_file := EMX_CACHE.get(cache_key)) is not None:
+            logging.info(f"EMX result found in cache: {res_file}")
+            return rf.Network(str(res_file))
+        os.makedirs(work_dir, exist_ok=True)
+        proc = await run_async(cmd, timeout=timeout, encoding="latin")
+        return self._load(proc, ports, work_dir, cache_key)
+
 
 def command(key: str, value: str) -> str:
     if len(key) > 1:
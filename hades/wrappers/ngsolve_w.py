@@ -27,6 +27,8 @@ def make_geometry(
     face = list()
     logging.info(f"Found {[c.name for c in gdsii.top_cells()]}")
     cell = gdsii.top_cells()[0]
+    # the layout generators may keep the hierarchy (see hades.layouts.tools.KEEP_HIERARCHY)
+    cell.flatten(-1, True)
     for id_lyr in gdsii.layer_indexes():
         logging.debug(f"Found {gdsii.layer_infos()[id_lyr]}")
         layer = gdsii.layer_infos()[id_lyr]
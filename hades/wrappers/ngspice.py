@@ -1,9 +1,23 @@
+import ctypes
 import logging
 import os
+import re
 import shutil
+from concurrent.futures import ProcessPoolExecutor
+from ctypes.util import find_library
+from dataclasses import dataclass, field
 from fileinput import FileInput
-from subprocess import run
+from itertools import product
+from subprocess import run, CompletedProcess
 from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Optional
+
+import numpy as np
+
+from .tools import run_async
+from ..parsers.netlist import Netlist
+from ..parsers.raw import RawPlot, load_plots
 
 
 class NGSpice:
@@ -17,15 +31,15 @@ class NGSpice:
     def parse(self):
         pass
 
-    def compute(
-        self, input_file: Path, data_file: Path = None, log_file: Path = None
-    ) -> None:
+    def _prepare(
+        self,
+        input_file: Path,
+        data_file: Path = None,
+        log_file: Path = None,
+        binary: bool = False,
+    ) -> tuple[list[str], Path]:
         """
-        Simulate the spice input file with ngspice.
-        :param input_file: a path to the spice input file.
-        :param data_file: a path to the data file. (default: same as input_file with .raw extension)
-        :param log_file: a path to the log file. (default: same as data_file with .log extension)
-        :return: None
+        Edit the input file to write the results in _data_file_ and return the ngspice command.
         """
         if type(input_file) is str:
             input_file = Path(input_file)
@@ -44,22 +58,27 @@ class NGSpice:
         # find the write statement and change the output file
         write_edited = False
         filetype_edited = False
+        filetype = f"set filetype = {'binary' if binary else 'ASCII'}"
         with FileInput(files=(input_file), inplace=True) as circuit_file:
             for line in circuit_file:
                 if line.startswith("write"):
+                    if not filetype_edited:
+                        # the file type must be set before writing
+                        print(filetype)
+                        filetype_edited = True
                     words = line.split(" ")
                     words[1] = str(data_file)
                     line = " ".join(words)
                     write_edited = True
                 if line.startswith("set filetype"):
-                    line = "set filetype = ASCII\n"
+                    line = filetype + "\n"
                     filetype_edited = True
                 if line.startswith(".endc"):
+                    if not filetype_edited:
+                        print(filetype)
                     if not write_edited:
                         # no write in the file, adding one
                         print(f"write {data_file} all")
-                    if not filetype_edited:
-                        print("set filetype = ASCII")
                 print(line, end="")
 
         cmd = [
@@ -70,9 +89,354 @@ class NGSpice:
             str(log_file),
         ]
         logging.info(" ".join(cmd))
-        proc = run(cmd, capture_output=True)
+        return cmd, data_file
+
+    @staticmethod
+    def _check(proc: CompletedProcess, data_file: Path) -> None:
         if proc.returncode != 0:
-            RuntimeWarning(str(cmd))
+            RuntimeWarning(str(proc.args))
             with open(data_file) as f:
                 strm = f.readlines()
             raise RuntimeError(strm)
+
+    def compute(
+        self,
+        input_file: Path,
+        data_file: Path = None,
+        log_file: Path = None,
+        binary: bool = False,
+    ) -> None:
+        """
+        Simulate the spice input file with ngspice.
+        :param input_file: a path to the spice input file.
+        :param data_file: a path to the data file. (default: same as input_file with .raw extension)
+        :param log_file: a path to the log file. (default: same as data_file with .log extension)
+        :param binary: if True, the data file is written in binary format (faster and smaller) instead of ASCII.
+            Both formats can be read with hades.parsers.raw.load_raw.
+        :return: None
+        """
+        cmd, data_file = self._prepare(input_file, data_file, log_file, binary)
+        proc = run(cmd, capture_output=True)
+        self._check(proc, data_file)
+
+    async def compute_async(
+        self,
+        input_file: Path,
+        data_file: Path = None,
+        log_file: Path = None,
+        binary: bool = False,
+        timeout: float = None,
+    ) -> None:
+        """
+        Asynchronous version of compute, the simulation is run with run_async.
+        :param timeout: maximum duration of the simulation in seconds.
+        :return: None
+        """
+        cmd, data_file = self._prepare(input_file, data_file, log_file, binary)
+        proc = await run_async(cmd, timeout=timeout, capture_output=False)
+        self._check(proc, data_file)
+
+    def compute_many(
+        self,
+        jobs: list[Path | str],
+        workers: int = 1,
+        binary: bool = True,
+    ) -> list["JobResult"]:
+        """
+        Simulate several spice input files in a process pool.
+        Each input file is copied in its own temporary directory where ngspice runs, so the files
+        are not modified, the same file can be simulated several times concurrently and the
+        relative outputs of the jobs (wrdata, write...) do not overwrite each other.
+        Relative includes are resolved from the directory of the original file.
+        :param jobs: paths to the spice input files.
+        :param workers: number of simulations running in parallel.
+        :param binary: if True, ngspice results are exchanged in binary format.
+        :return: the results of the jobs in the order of _jobs_. Failed jobs have no plots and an error message.
+        """
+        logging.info(f"Simulating {len(jobs)} netlists with {workers} workers")
+        results = []
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_run_job, Path(job), binary) for job in jobs]
+            for job, future in zip(jobs, futures):
+                try:
+                    results.append(JobResult(Path(job), future.result()))
+                except Exception as e:
+                    logging.error(f"Simulation of {job} failed: {e}")
+                    results.append(
+                        JobResult(Path(job), error=f"{type(e).__name__}: {e}")
+                    )
+        return results
+
+    def sweep(
+        self,
+        netlist: Netlist,
+        params_grid: dict[str, list[float]],
+        analysis: str,
+        vector: str,
+        workers: int = 1,
+    ) -> np.ndarray:
+        """
+        Simulate _netlist_ for every combination of the parameter values (see Netlist.ngspice)
+        and return the values of _vector_. The points are simulated in parallel with compute_many.
+        Transient results are linearized so that all the points share the same time steps.
+        :param netlist: netlist with components valued by parameters.
+        :param params_grid: list of values of each swept parameter.
+        :param analysis: ngspice analysis command (e.g.: "tran 1n 100n", "ac dec 10 1k 1G").
+        :param vector: name of the vector to return (e.g.: "v(out)").
+        :param workers: number of simulations running in parallel.
+        :return: the values of _vector_, with one axis per parameter (in the order of _params_grid_)
+            followed by the axis of the analysis scale.
+        """
+        control = [analysis]
+        if analysis.split()[0] == "tran":
+            control.append("linearize")
+        points = [dict(zip(params_grid, val)) for val in product(*params_grid.values())]
+        with TemporaryDirectory(prefix="hades_sweep_") as work_dir:
+            jobs = []
+            for i, params in enumerate(points):
+                jobs.append(Path(work_dir) / f"{netlist.name}_{i}.cir")
+                with open(jobs[-1], "w") as f:
+                    f.write(netlist.ngspice(params, control))
+            results = self.compute_many(jobs, workers)
+        errors = [
+            f"{params}: {res.error}"
+            for params, res in zip(points, results)
+            if res.error is not None
+        ]
+        if errors:
+            raise RuntimeError("Sweep failed for:\n" + "\n".join(errors))
+        # the last plot is the linearized one for transient analysis
+        data = [list(res.plots.values())[-1][vector] for res in results]
+        return np.stack(data).reshape(*(len(v) for v in params_grid.values()), -1)
+
+
+@dataclass
+class JobResult:
+    """
+    Result of a simulation run by NGSpice.compute_many.
+    :param netlist: path to the simulated netlist.
+    :param plots: simulated plots by name (see hades.parsers.raw.load_plots).
+    :param error: error message if the simulation failed, None otherwise.
+    """
+
+    netlist: Path
+    plots: dict[str, RawPlot] = field(default_factory=dict)
+    error: Optional[str] = None
+
+
+_INCLUDE = re.compile(r"^(\s*\.(?:include|inc|lib)\s+)([\"']?)([^\"'\s]+)\2", re.I)
+
+
+def _copy_netlist(netlist: Path, input_file: Path) -> None:
+    # copy the netlist with its relative includes resolved from its directory
+    base = netlist.absolute().parent
+    with open(netlist) as src, open(input_file, "w") as dst:
+        for line in src:
+            m = _INCLUDE.match(line)
+            if m and not Path(m[3]).is_absolute() and (base / m[3]).exists():
+                line = f"{m[1]}{m[2]}{(base / m[3]).as_posix()}{m[2]}{line[m.end() :]}"
+            dst.write(line)
+
+
+def _run_job(netlist: Path, binary: bool) -> dict[str, RawPlot]:
+    with TemporaryDirectory(prefix="hades_ngspice_") as work_dir:
+        input_file = Path(work_dir) / netlist.name
+        _copy_netlist(netlist, input_file)
+        spice = NGSpice()
+        cmd, data_file = spice._prepare(input_file, binary=binary)
+        # run in the temporary directory, the relative outputs of the jobs are kept apart
+        proc = run(cmd, capture_output=True, cwd=work_dir)
+        if proc.returncode != 0 or not data_file.exists():
+            log_file = data_file.with_suffix(".log")
+            log = log_file.read_text(errors="replace") if log_file.exists() else ""
+            raise RuntimeError(
+                f"ngspice failed with code {proc.returncode}:\n"
+                + "\n".join(log.splitlines()[-20:])
+            )
+        plots = load_plots(data_file)
+        # the data must not refer to the temporary directory
+        for plot in plots.values():
+            plot.data = np.array(plot.data)
+    return plots
+
+
+class _VectorInfo(ctypes.Structure):
+    _fields_ = [
+        ("v_name", ctypes.c_char_p),
+        ("v_type", ctypes.c_int),
+        ("v_flags", ctypes.c_short),
+        ("v_realdata", ctypes.POINTER(ctypes.c_double)),
+        ("v_compdata", ctypes.POINTER(ctypes.c_double)),
+        ("v_length", ctypes.c_int),
+    ]
+
+
+_SendChar = ctypes.CFUNCTYPE(
+    ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_void_p
+)
+_ControlledExit = ctypes.CFUNCTYPE(
+    ctypes.c_int,
+    ctypes.c_int,
+    ctypes.c_bool,
+    ctypes.c_bool,
+    ctypes.c_int,
+    ctypes.c_void_p,
+)
+
+
+def find_libngspice() -> Optional[str]:
+    """
+    Return the path of the ngspice shared library, given by the NGSPICE_LIBRARY_PATH
+    environment variable or found in the system library path. None if not found.
+    """
+    if "NGSPICE_LIBRARY_PATH" in os.environ:
+        return os.environ["NGSPICE_LIBRARY_PATH"]
+    return find_library("ngspice")
+
+
+class NGSpiceShared:
+    """
+    In-process ngspice simulation using the ngspice shared library (libngspice).
+    The circuit is sent as lines and the vectors are read from memory as numpy arrays,
+    without process start-up nor file exchanges. Once loaded, the circuit can be modified
+    with alter and simulated again.
+    The ngspice library has a global state: all the instances share the same simulator.
+    :param library: path to the shared library (default: see find_libngspice).
+    """
+
+    _lib = None
+    _callbacks = ()
+    # instance receiving the messages of ngspice
+    _current = None
+
+    def __init__(self, library: str = None):
+        self._errors = []
+        NGSpiceShared._current = self
+        if NGSpiceShared._lib is None:
+            library = library or find_libngspice()
+            if library is None:
+                raise RuntimeError("NGSpice shared library (libngspice) not found.")
+            lib = ctypes.CDLL(library)
+            lib.ngSpice_Command.argtypes = [ctypes.c_char_p]
+            lib.ngSpice_Circ.argtypes = [ctypes.POINTER(ctypes.c_char_p)]
+            lib.ngGet_Vec_Info.argtypes = [ctypes.c_char_p]
+            lib.ngGet_Vec_Info.restype = ctypes.POINTER(_VectorInfo)
+            lib.ngSpice_CurPlot.restype = ctypes.c_char_p
+            lib.ngSpice_AllVecs.argtypes = [ctypes.c_char_p]
+            lib.ngSpice_AllVecs.restype = ctypes.POINTER(ctypes.c_char_p)
+            # callbacks must outlive the library
+            NGSpiceShared._callbacks = (
+                _SendChar(NGSpiceShared._send_char),
+                _ControlledExit(NGSpiceShared._controlled_exit),
+            )
+            lib.ngSpice_Init(
+                NGSpiceShared._callbacks[0],
+                None,
+                NGSpiceShared._callbacks[1],
+                None,
+                None,
+                None,
+                None,
+            )
+            NGSpiceShared._lib = lib
+
+    @staticmethod
+    def _send_char(message: bytes, ident: int, user: ctypes.c_void_p) -> int:
+        message = message.decode("latin")
+        if message.startswith("stderr"):
+            message = message[7:]
+            logging.warning(message)
+            if message.lower().startswith("error") and NGSpiceShared._current:
+                NGSpiceShared._current._errors.append(message)
+        else:
+            logging.debug(message.removeprefix("stdout "))
+        return 0
+
+    @staticmethod
+    def _controlled_exit(
+        status: int, unload: bool, quit: bool, ident: int, user: ctypes.c_void_p
+    ) -> int:
+        if NGSpiceShared._current:
+            NGSpiceShared._current._errors.append(
+                f"ngspice exited with status {status}"
+            )
+        return 0
+
+    def _check(self, what: str):
+        if self._errors:
+            errors, self._errors = self._errors, []
+            raise RuntimeError(f"{what} failed: {errors}")
+
+    def command(self, cmd: str) -> None:
+        """
+        Execute a ngspice command (as in the .control section).
+        """
+        NGSpiceShared._current = self
+        logging.debug(f"ngspice: {cmd}")
+        if self._lib.ngSpice_Command(cmd.encode()) != 0:
+            self._errors.append(f"ngspice returned an error for {cmd}")
+        self._check(cmd)
+
+    def load(self, circuit: str | Path | list[str]) -> None:
+        """
+        Load a circuit in ngspice, replacing the previous one.
+        :param circuit: spice netlist as a file, a string or a list of lines.
+            The first line is the title, the last one must be .end.
+        """
+        if isinstance(circuit, Path):
+            with open(circuit) as f:
+                circuit = f.read()
+        if isinstance(circuit, str):
+            circuit = circuit.splitlines()
+        NGSpiceShared._current = self
+        self._lib.ngSpice_Command(b"remcirc")
+        self._errors = []
+        lines = (ctypes.c_char_p * (len(circuit) + 1))(
+            *(line.encode() for line in circuit), None
+        )
+        if self._lib.ngSpice_Circ(lines) != 0:
+            self._errors.append("circuit not loaded")
+        self._check("Loading the circuit")
+
+    def alter(self, device: str, value: float = None, **params: float) -> None:
+        """
+        Change the value or the parameters of a device of the loaded circuit.
+        The change is taken into account at the next run.
+        :param device: name of the device (e.g.: R1, m1).
+        :param value: new value of the device.
+        :param params: new parameters of the device (e.g.: w=2e-6).
+        """
+        if value is not None:
+            self.command(f"alter {device} {value}")
+        for key, val in params.items():
+            self.command(f"alter {device} {key}={val}")
+
+    def vectors(self, plot: str = None) -> dict[str, np.ndarray]:
+        """
+        Return a copy of the vectors of _plot_ (by default, the last simulated plot).
+        """
+        if plot is None:
+            plot = self._lib.ngSpice_CurPlot().decode()
+        names = self._lib.ngSpice_AllVecs(plot.encode())
+        res = {}
+        i = 0
+        while names[i] is not None:
+            name = names[i].decode()
+            info = self._lib.ngGet_Vec_Info(f"{plot}.{name}".encode()).contents
+            if info.v_realdata:
+                data = np.ctypeslib.as_array(info.v_realdata, (info.v_length,))
+            else:
+                data = np.ctypeslib.as_array(info.v_compdata, (info.v_length, 2))
+                data = data.view(np.complex128)[:, 0]
+            res[name] = data.copy()
+            i += 1
+        return res
+
+    def run(self, analysis: str = None) -> dict[str, np.ndarray]:
+        """
+        Run the simulation of the loaded circuit.
+        :param analysis: analysis to run (e.g.: "tran 1n 10n"). If None, run the analyses of the netlist.
+        :return: the simulated vectors.
+        """
+        self.command(analysis if analysis is not None else "run")
+        return self.vectors()
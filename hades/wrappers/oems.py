@@ -102,6 +102,8 @@ def compute(
     layout.read(input_file)
     dbu = layout.dbu
     gdsii = layout.top_cells()[0]
+    # the ports are searched in the flat geometry
+    gdsii.flatten(-1, True)
     proc_file = get_file("mock", "process")
     _, metals = layer_stack(proc_file)
     ports = []
@@ -188,9 +190,11 @@ def make_geometry(
     layout.read(gds_file)
     dbu = layout.dbu
     if cell_name is None:
-        gdsii = layout.top_cells[0]
+        gdsii = layout.top_cells()[0]
     else:
         gdsii = layout.cell(cell_name)
+    # the layout generators may keep the hierarchy (see hades.layouts.tools.KEEP_HIERARCHY)
+    gdsii.flatten(-1, True)
 
     CSX = CSXCAD.ContinuousStructure()
 
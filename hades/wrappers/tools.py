@@ -1,8 +1,17 @@
+import asyncio
 import logging
 import os
+import shutil
+from hashlib import sha256
 from os.path import dirname
 from pathlib import Path
-from subprocess import run, CompletedProcess
+from subprocess import run, CompletedProcess, PIPE, TimeoutExpired
+from typing import Optional
+from weakref import WeakKeyDictionary
+
+# maximum number of external processes run at the same time by run_async
+MAX_PROCESSES = os.cpu_count() or 1
+_semaphores: WeakKeyDictionary = WeakKeyDictionary()
 
 
 def nix_check():
@@ -39,7 +48,7 @@ def to_wsl(path: (Path | str)):
     return path
 
 
-def nix_run(cmd: list[str]) -> CompletedProcess:
+def _nix_command(cmd: list[str]) -> list[str]:
     over_head = [
         "nix-shell",
         "--command",
@@ -50,5 +59,169 @@ def nix_run(cmd: list[str]) -> CompletedProcess:
     shell_path = Path(dirname(dirname(dirname(__file__))) + "/shell.nix")
     over_head.append(to_wsl(shell_path))
     logging.info('" "'.join(over_head))
-    proc = run(over_head, capture_output=True, text=True)
+    return over_head
+
+
+def nix_run(cmd: list[str]) -> CompletedProcess:
+    proc = run(_nix_command(cmd), capture_output=True, text=True)
     return proc
+
+
+async def nix_run_async(cmd: list[str], **kwargs) -> CompletedProcess:
+    """
+    Asynchronous version of nix_run. Keyword arguments are passed to run_async.
+    """
+    return await run_async(_nix_command(cmd), **kwargs)
+
+
+def _semaphore() -> asyncio.Semaphore:
+    # a semaphore can only be used in one event loop
+    loop = asyncio.get_running_loop()
+    if loop not in _semaphores:
+        _semaphores[loop] = asyncio.Semaphore(MAX_PROCESSES)
+    return _semaphores[loop]
+
+
+async def _stream(
+    reader: asyncio.StreamReader,
+    level: int,
+    buffer: Optional[list[str]],
+    encoding: str,
+):
+    async for line in reader:
+        line = line.decode(encoding, errors="replace")
+        logging.log(level, line.rstrip())
+        if buffer is not None:
+            buffer.append(line)
+
+
+async def run_async(
+    cmd: list[str],
+    timeout: Optional[float] = None,
+    cwd: Optional[Path] = None,
+    capture_output: bool = True,
+    encoding: str = "utf-8",
+) -> CompletedProcess:
+    """
+    Run _cmd_ in a subprocess without blocking the event loop.
+    The outputs are logged line by line while the process runs (stdout at debug level, stderr at warning level).
+    At most MAX_PROCESSES commands run at the same time, the others wait for a free slot.
+    The process is killed if the timeout expires or if the task is cancelled.
+    :param cmd: command and its arguments.
+    :param timeout: maximum duration of the process in seconds (None for no limit).
+    :param cwd: working directory of the process.
+    :param capture_output: if True, stdout and stderr are also kept in the returned object.
+    :param encoding: encoding of the outputs.
+    :return: the completed process.
+    :raise TimeoutExpired: if the process did not finish before the timeout.
+    """
+    stdout = [] if capture_output else None
+    stderr = [] if capture_output else None
+    async with _semaphore():
+        proc = await asyncio.create_subprocess_exec(
+            *cmd, stdout=PIPE, stderr=PIPE, cwd=cwd
+        )
+        try:
+            async with asyncio.timeout(timeout):
+                await asyncio.gather(
+                    _stream(proc.stdout, logging.DEBUG, stdout, encoding),
+                    _stream(proc.stderr, logging.WARNING, stderr, encoding),
+                    proc.wait(),
+                )
+        except BaseException as e:
+            if proc.returncode is None:
+                proc.kill()
+                await proc.wait()
+            if isinstance(e, TimeoutError):
+                raise TimeoutExpired(cmd, timeout) from e
+            raise
+    return CompletedProcess(
+        cmd,
+        proc.returncode,
+        "".join(stdout) if capture_output else None,
+        "".join(stderr) if capture_output else None,
+    )
+
+
+class FileCache:
+    """
+    Content-addressed store of simulation results.
+    Files are stored under the hash of their inputs. When the store exceeds
+    _max_size_ bytes, the least recently used files are removed.
+    :param directory: directory of the store.
+    :param max_size: maximum size of the store in bytes.
+    """
+
+    def __init__(self, directory: Path, max_size: int = 2**30):
+        self.directory = Path(directory)
+        self.max_size = max_size
+
+    @staticmethod
+    def key(*inputs: bytes | str | Path) -> str:
+        """
+        Hash the given inputs. Paths are hashed using the content of the file.
+        """
+        h = sha256()
+        for i in inputs:
+            if isinstance(i, Path):
+                with open(i, "rb") as f:
+                    i = f.read()
+            h.update(i if isinstance(i, bytes) else str(i).encode())
+            h.update(b"\0")
+        return h.hexdigest()
+
+    def get(self, key: str) -> Optional[Path]:
+        """
+        Return the stored file associated with _key_ or None.
+        """
+        for file in self.directory.glob(key + ".*"):
+            try:
+                # update the access time used for eviction
+                os.utime(file)
+            except FileNotFoundError:
+                # evicted by another process
+                return None
+            return file
+        return None
+
+    def put(self, key: str, file: Path) -> Optional[Path]:
+        """
+        Copy _file_ in the store under _key_ and evict the oldest files if needed.
+        The file is written under a temporary name and then renamed, so that other processes
+        sharing the store never read a partial file.
+        :return: path of the stored file, None if it could not be stored.
+        """
+        stored = self.directory / (key + Path(file).suffix)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # the temporary name does not match the glob of get
+            tmp_file = self.directory / f".{stored.name}.{os.getpid()}.tmp"
+            shutil.copyfile(file, tmp_file)
+            os.replace(tmp_file, stored)
+            self._evict(stored)
+        except OSError as e:
+            logging.warning(f"Unable to store {file} in {self.directory}: {e}")
+            return None
+        return stored
+
+    def _evict(self, stored: Path):
+        # other processes may evict the same files concurrently
+        files = []
+        for f in self.directory.iterdir():
+            if f.name.startswith("."):
+                continue
+            try:
+                st = f.stat()
+            except FileNotFoundError:
+                continue
+            files.append((st.st_mtime, st.st_size, f))
+        files.sort(key=lambda t: t[0])
+        size = sum(t[1] for t in files)
+        for _, old_size, old in files:
+            if size <= self.max_size:
+                break
+            if old == stored:
+                continue
+            size -= old_size
+            old.unlink(missing_ok=True)
+            logging.debug(f"{old.name} evicted from {self.directory}")
@@ -0,0 +1,20 @@
+import shutil
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from hades.parsers import tools
+
+
+def pytest_configure(config):
+    # the tests do not write in the user cache. It is set before the collection
+    # as some test modules parse the pdk files when imported.
+    config.hades_cache = pytest.MonkeyPatch()
+    cache_dir = Path(tempfile.mkdtemp(prefix="hades-cache-"))
+    config.hades_cache.setattr(tools, "CACHE_DIR", cache_dir)
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(tools.CACHE_DIR, ignore_errors=True)
+    config.hades_cache.undo()
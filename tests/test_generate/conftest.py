@@ -0,0 +1,55 @@
+from pathlib import Path
+
+import klayout.db as db
+import pytest
+from pydantic import BaseModel
+
+
+class Specifications(BaseModel):
+    L: float
+
+
+class Dimensions(BaseModel):
+    W: float
+
+
+class Parameters(BaseModel):
+    K: float = 2
+
+
+class FakeDevice:
+    """Device whose model converges towards a true factor of 1, without any simulation."""
+
+    def __init__(self, name: str, techno: str):
+        self.name = name
+        self.techno = techno
+        self.parameters = Parameters()
+        self.layout = db.Layout()
+        self.runs = 0
+
+    def update_model(self, specifications: dict) -> Dimensions:
+        if specifications["L"] < 0:
+            raise ValueError("negative inductance")
+        self.dimensions = Dimensions(
+            W=specifications["L"] * specifications.get("n", 1) / self.parameters.K
+        )
+        return self.dimensions
+
+    def update_cell(self, dimensions: dict) -> db.Cell:
+        cell = self.layout.create_cell(self.name)
+        width = round(dimensions["W"] / self.layout.dbu)
+        cell.shapes(self.layout.layer(1, 0)).insert(db.Box(0, 0, width, 10))
+        return cell
+
+    def update_accurate(self, sim_file: Path) -> Specifications:
+        self.runs += 1
+        return Specifications(L=self.dimensions.W)
+
+    def recalibrate_model(self, performances: Specifications) -> Parameters:
+        self.parameters.K = (self.parameters.K + 1) / 2
+        return self.parameters
+
+
+@pytest.fixture
+def fake_device() -> type[FakeDevice]:
+    return FakeDevice
@@ -0,0 +1,16 @@
+from hades.devices.device import generate
+
+
+def test_generate_convergence(tmp_path, monkeypatch, fake_device):
+    monkeypatch.chdir(tmp_path)
+    dut = fake_device("conv", "mock")
+    residuals = []
+    generate(dut, {"L": 1}, rtol=1e-2, max_iter=20, residuals=residuals)
+    assert dut.runs == len(residuals) < 20
+    assert all(r <= 1e-2 for r in residuals[-1])
+    assert residuals[0][0] > residuals[-1][0]
+
+    dut = fake_device("conv", "mock")
+    residuals = []
+    generate(dut, {"L": 1}, rtol=1e-9, max_iter=3, residuals=residuals)
+    assert dut.runs == len(residuals) == 3
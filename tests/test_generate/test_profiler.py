@@ -0,0 +1,44 @@
+import json
+
+import pytest
+
+from hades.devices.device import generate, Step
+from hades.devices.profiler import Profiler
+from hades.main import generate_cli
+
+
+def test_profiler(tmp_path, monkeypatch, fake_device):
+    monkeypatch.chdir(tmp_path)
+    profiler = Profiler()
+    generate(
+        fake_device("box", "mock"), {"L": 10}, stop=Step.geometries, profiler=profiler
+    )
+    assert [e["name"] for e in profiler.events] == [
+        "update_model",
+        "update_cell",
+        "write",
+        "iteration",
+    ]
+    assert all(e["iteration"] == 0 and e["wall"] >= 0 for e in profiler.events)
+    assert profiler.events[-1]["wall"] >= sum(e["wall"] for e in profiler.events[:-1])
+    assert profiler.summary()["write"]["count"] == 1
+
+    profiler.write(tmp_path / "prof.json")
+    with open(tmp_path / "prof.json") as f:
+        assert len(json.load(f)["stages"]) == 4
+    profiler.write(tmp_path / "trace.json", "chrome")
+    with open(tmp_path / "trace.json") as f:
+        trace = json.load(f)["traceEvents"]
+    assert trace[0]["ph"] == "X" and trace[0]["name"] == "update_model"
+
+
+def test_profile_format(tmp_path):
+    with pytest.raises(ValueError):
+        Profiler().write(tmp_path / "prof.txt", "txt")
+    # checked before the design is read
+    with pytest.raises(ValueError):
+        generate_cli(
+            design_yaml=tmp_path / "missing.yml",
+            profile=tmp_path / "prof.txt",
+            profile_format="txt",
+        )
@@ -0,0 +1,39 @@
+from pathlib import Path
+
+import pytest
+
+from hades.devices.device import sweep, Step
+
+
+def test_sweep(tmp_path, fake_device):
+    res = sweep(
+        fake_device,
+        {"L": [1, -1, 2], "n": [1, 2]},
+        "mock",
+        name="ind",
+        stop=Step.geometries,
+        workers=2,
+        work_dir=tmp_path,
+    )
+    assert len(res) == 6
+    assert list(res["L"]) == [1, 1, -1, -1, 2, 2]
+    assert list(res["W"].dropna()) == [0.5, 1, 1, 2]
+    assert res["error"].isna().sum() == 4
+    assert "negative inductance" in res["error"][2]
+    assert Path(tmp_path / "ind_5" / "ind_5.gds").exists()
+    assert not Path(tmp_path / "ind_2" / "ind_2.gds").exists()
+
+
+def test_sweep_convergence(tmp_path, fake_device):
+    res = sweep(
+        fake_device,
+        {"L": [1, 2]},
+        "mock",
+        name="conv",
+        max_iter=20,
+        rtol=1e-2,
+        work_dir=tmp_path,
+    )
+    assert res["error"].isna().all()
+    # the factor converges towards 1
+    assert list(res["W"]) == pytest.approx([1, 2], rel=2e-2)
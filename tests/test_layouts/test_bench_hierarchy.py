@@ -0,0 +1,48 @@
+from time import perf_counter
+
+from klayout import db
+
+from hades.layouts import tools
+from hades.layouts.inductor import octagonal_inductor
+from hades.layouts.tools import LayerStack
+
+stack = LayerStack("mock")
+
+
+def shape_count(layout: db.Layout) -> int:
+    # shapes stored in the layout (not the flat shapes)
+    return sum(
+        cell.shapes(lyr).size()
+        for cell in layout.each_cell()
+        for lyr in layout.layer_indexes()
+    )
+
+
+def test_bench_hierarchy(tmp_path, monkeypatch):
+    res = {}
+    for keep in (False, True):
+        monkeypatch.setattr(tools, "KEEP_HIERARCHY", keep)
+        lib = db.Layout()
+        top = lib.create_cell("top")
+        ind = octagonal_inductor(lib, 80e-6, 4, 10e-6, 2e-6, stack)
+        pitch = db.DVector(300, 0), db.DVector(0, 300)
+        top.insert(db.DCellInstArray(ind.cell_index(), db.DTrans(), *pitch, 10, 10))
+        start = perf_counter()
+        lib.write(tmp_path / f"ind_{keep}.gds")
+        write_time = perf_counter() - start
+        res[keep] = shape_count(lib)
+        print(f"{keep=}: {res[keep]} shapes written in {write_time * 1e3:.1f} ms")
+    # the via arrays and the vias of the crossings are not duplicated
+    assert res[True] < res[False] / 10
+    # the flat geometries are the same
+    flat = db.Layout()
+    flat.read(tmp_path / "ind_True.gds")
+    flat.top_cell().flatten(-1, True)
+    ref = db.Layout()
+    ref.read(tmp_path / "ind_False.gds")
+    ref.top_cell().flatten(-1, True)
+    start = perf_counter()
+    ref.write(tmp_path / "ind_flat.gds")
+    write_time = perf_counter() - start
+    print(f"flat: {shape_count(ref)} shapes written in {write_time * 1e3:.1f} ms")
+    assert db.LayoutDiff().compare(flat, ref)
@@ -1,6 +1,14 @@
 import klayout.db as kl
 
-from hades.layouts.general import via, via_stack, ground_plane, get_dtext, get_shape
+from hades.layouts.general import (
+    via,
+    via_stack,
+    ground_plane,
+    get_dtext,
+    get_shape,
+    LayoutIndex,
+    set_as_port,
+)
 from hades.layouts.tools import LayerStack, check_diff
 from os.path import dirname, join
 
@@ -17,6 +25,29 @@ def test_via(tmp_path):
     check_diff(tmp_path / "via.gds", join(REF_PATH, "ref_via.gds"))
 
 
+def test_via_cache(tmp_path):
+    lib = kl.Layout()
+    v1 = via(lib, stack.get_via_layer(2), (3, 4))
+    assert via(lib, stack.get_via_layer(2), (3, 4)).cell_index() == v1.cell_index()
+    v2 = via(lib, stack.get_via_layer(2), (4, 4))
+    assert v2.cell_index() != v1.cell_index()
+    # the via cut is shared by the two arrays
+    assert lib.cells() == 3
+    assert v1.child_instances() == 1
+    # a new layout has its own vias
+    lib2 = kl.Layout()
+    via(lib2, stack.get_via_layer(2), (3, 4))
+    assert lib2.cells() == 2 and lib.cells() == 3
+    # the array gives the same geometry as the flat reference
+    lib.delete_cell(v2.cell_index())
+    v1.flatten(-1, True)
+    lib.write(tmp_path / "via.gds")
+    assert check_diff(tmp_path / "via.gds", join(REF_PATH, "ref_via.gds"))
+    # the pruned via cut is drawn again
+    v3 = via(lib, stack.get_via_layer(2), (4, 4))
+    assert v3.child_instances() == 1 and len(list(lib.each_cell())) == 3
+
+
 def test_via_stack(tmp_path):
     lib = kl.Layout()
     via_stack(lib, stack, 2, 1, (3, 4))
@@ -46,6 +77,35 @@ def test_shape():
     assert box == kl.DBox(0, -1.1, 3.65, -0.7)
 
 
+def test_layout_index():
+    lib = kl.Layout()
+    lib.read(join(REF_PATH, "ref_line.gds"))
+    index = LayoutIndex(lib)
+    assert index.get_dtext("gnd") == get_dtext(lib, "gnd")
+    assert index.get_dtext("missing") is None
+    assert index.get_dtext("gnd", lib.cell("top").cell_index()) is None
+    gnd, lyr = index.get_dtext("gnd", lib.cell("h_gnd").cell_index())
+    assert index.get_shape(gnd.position(), lyr) == (kl.DBox(0, -1.1, 3.65, -0.7), 0)
+    assert index.get_shape(kl.DPoint(0, -2), lyr) is None
+
+
+def test_set_as_port():
+    lib = kl.Layout()
+    lyr = lib.layer(1, 0)
+    top, a, b, other = (lib.create_cell(n) for n in ("top", "a", "b", "other"))
+    a.shapes(lyr).insert(kl.DText("p", 1, 2))
+    other.shapes(lyr).insert(kl.DText("q", 0, 0))
+    for child in (a, b):
+        top.insert(kl.DCellInstArray(child, kl.DVector(0, 0)))
+    set_as_port(top, "p")
+    assert [s.dtext for s in top.shapes(lyr).each()] == [kl.DText("p", 1, 2)] * 2
+    # the label is searched in the whole layout
+    set_as_port(top, "q")
+    assert top.shapes(lyr).size() == 4
+    set_as_port(top, "missing")
+    assert top.shapes(lyr).size() == 4
+
+
 def test_ground_plane(tmp_path):
     lib = kl.Layout()
     ground_plane(lib, stack, (3, 4), 1)
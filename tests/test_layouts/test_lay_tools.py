@@ -1,3 +1,4 @@
+from dataclasses import FrozenInstanceError
 from os.path import dirname, join, isdir
 import os
 import pytest
@@ -63,3 +64,37 @@ def test_layer_stack_sw():
     assert layer_stack.get_via_layer(-2) == tools.ViaLayer(
         71, 44, "via4", 0.8, 0.8, enclosure=0.31
     )
+
+
+@pytest.mark.skipif(not isdir("./pdk/mock"), reason="PDK not installed.")
+def test_layer_stack_for_techno():
+    stack = tools.LayerStack.for_techno("mock")
+    assert stack is tools.LayerStack.for_techno("mock")
+    assert stack == tools.LayerStack("mock")
+    with pytest.raises(FrozenInstanceError):
+        stack._gate = tools.Layer(2, 0)
+    tlef = join(dirname(__file__), "../../pdk/mock/mock.tlef")
+    st = os.stat(tlef)
+    try:
+        os.utime(tlef, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        new_stack = tools.LayerStack.for_techno("mock")
+        assert new_stack is not stack
+        assert new_stack == stack
+    finally:
+        os.utime(tlef, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+
+@pytest.mark.skipif(not isdir("./pdk/mock"), reason="PDK not installed.")
+def test_layer_stack_lookup():
+    stack = tools.LayerStack("mock")
+    metal1 = stack.get_metal_layer(1)
+    assert stack.get_layer("Metal1") is metal1
+    assert stack.get_layer("Pad") is stack.get_pad_layer()
+    assert stack.get_id(*metal1.drawing) == 1
+    assert stack.get_id(1000, 0) is None
+    with pytest.raises(KeyError):
+        stack.get_layer("Metal42")
+    with pytest.raises(IndexError):
+        stack.get_metal_layer(42)
+    with pytest.raises(IndexError):
+        stack.get_via_layer(42)
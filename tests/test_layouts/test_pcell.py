@@ -0,0 +1,55 @@
+from os.path import dirname, join, getmtime
+
+from klayout import db
+
+from hades.layouts.inductor import octagonal_inductor
+from hades.layouts.microstrip import straight_line
+from hades.layouts import pcell, tools
+from hades.layouts.pcell import PCellCache
+from hades.layouts.tools import LayerStack, check_diff
+
+layerstack = LayerStack("mock")
+REF_PATH = dirname(__file__)
+
+
+def test_pcell_cache(tmp_path):
+    cache = PCellCache(size=2)
+    lib = db.Layout()
+    args = (80e-6, 2, 5e-6, 2e-6, layerstack)
+    kwargs = dict(port_gap=10e-6, port_ext=15e-6)
+    ind = cache.get(octagonal_inductor, lib, *args, **kwargs)
+    assert (cache.hits, cache.misses) == (0, 1)
+    # same parameters (up to the rounding noise): the cell is not drawn again
+    same = cache.get(octagonal_inductor, lib, 80e-6 + 1e-20, *args[1:], **kwargs)
+    assert same.cell_index() == ind.cell_index()
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert len(list(lib.each_cell())) == 1
+    # another layout gets a copy
+    lib2 = db.Layout()
+    cache.get(octagonal_inductor, lib2, *args, **kwargs)
+    assert cache.hits == 2
+    lib2.write(tmp_path / "ind2.gds")
+    assert check_diff(tmp_path / "ind2.gds", join(REF_PATH, "ref_ind2.gds"))
+    # the least recently used cell is removed
+    cache.get(straight_line, lib, 10e-6, 50e-6, layerstack)
+    cache.get(straight_line, lib, 10e-6, 60e-6, layerstack)
+    assert len(cache) == 2 and cache.misses == 3
+    cache.get(octagonal_inductor, lib, *args, **kwargs)
+    assert cache.misses == 4
+
+
+def test_pcell_cache_key(monkeypatch):
+    cache = PCellCache()
+    args = (80e-6, 2, 5e-6, 2e-6, layerstack)
+    libs = [db.Layout() for _ in range(3)]
+    flat = cache.get(octagonal_inductor, libs[0], *args)
+    assert flat.child_instances() == 0
+    # the hierarchy is part of the key
+    monkeypatch.setattr(tools, "KEEP_HIERARCHY", True)
+    cell = cache.get(octagonal_inductor, libs[1], *args)
+    assert cache.misses == 2 and cell.child_instances() == 2
+    # as well as the modification time of the pdk files
+    mtime = getmtime
+    monkeypatch.setattr(pcell, "getmtime", lambda f: mtime(f) + 1)
+    cache.get(octagonal_inductor, libs[2], *args)
+    assert cache.misses == 3
@@ -1,5 +1,7 @@
 from math import sqrt
 
+import numpy as np
+
 from hades.models import tools
 from pytest import approx
 
@@ -33,3 +35,9 @@ def test_eng():
     assert tools.eng(1000) == "1.000 k"
     assert tools.eng(1e-3, prefix=False, precision=0) == "1e-3"
     assert tools.eng(-1000, precision=2) == "-1.00 k"
+
+
+def test_eng_array():
+    res = tools.eng(np.array([1, 1000, -2.2e-9, 0]))
+    assert list(res) == ["1.000 ", "1.000 k", "-2.200 n", "0.000 "]
+    assert list(tools.eng([1e3, 1e-3], prefix=False, precision=0)) == ["1e3", "1e-3"]
@@ -0,0 +1,22 @@
+from os.path import isfile
+from time import perf_counter
+
+import pytest
+
+from hades.parsers.tlef import TechLef
+from hades.parsers.tools import get_parser, parse
+from hades.techno import get_file
+
+SKY130_TLEF = get_file("sky130", "techlef")
+pytestmark = pytest.mark.skipif(not isfile(SKY130_TLEF), reason="PDK not installed.")
+
+
+def test_bench_sky130_tlef():
+    # grammar compilation is not part of the benchmark
+    get_parser("tlef", "auto")
+    start = perf_counter()
+    tree = parse(SKY130_TLEF, "tlef", "auto")
+    parse_time = perf_counter() - start
+    stack = TechLef().transform(tree)
+    print(f"{SKY130_TLEF.name} parsed in {parse_time * 1e3:.1f} ms")
+    assert len(stack.layers) > 0
@@ -1,5 +1,7 @@
-from hades.parsers.netlist import Component, Netlist
-from skrf import DefinedGammaZ0, Frequency, c
+import numpy as np
+import pytest
+from hades.parsers.netlist import Component, Netlist, ColumnarNetlist
+from skrf import DefinedGammaZ0, Frequency, c, cascade_list
 
 
 def test_component():
@@ -18,3 +20,78 @@ def test_netlist():
     net.append(Component("C", "5", 5e-12, ("gnd", "5")))
     assert net.name == "test"
     assert net.spice() == "#test\nC5 gnd 5 5.000 pF\n"
+
+
+def test_netlist_ngspice():
+    net = Netlist("rc", params={"r": 1e3})
+    net.append(Component("R", "1", "r", ("in", "out")))
+    net.append(Component("C", "1", "c", ("out", "0")))
+    assert str(net.circuit[0]) == "R1 in out {r}"
+    assert net.ngspice({"c": 1e-12}, ["tran 1n 10n"]) == (
+        "* rc\n.param r=1000.0\n.param c=1e-12\n"
+        "R1 in out {r}\nC1 out 0 {c}\n.control\ntran 1n 10n\n.endc\n.end\n"
+    )
+    with pytest.raises(KeyError):
+        net.ngspice()
+
+
+def test_netlist_write(tmp_path):
+    net = Netlist("big")
+    for i in range(25):
+        net.append(Component("R", str(i), 10.0 ** (i - 12) / 7, (f"n{i}", f"n{i + 1}")))
+    net.append(Component("C", "p", "c", ("n0", "0")))
+    net.write(tmp_path / "big.cir", chunk_size=10)
+    expected = "#big\n" + "".join(f"{c}\n" for c in net.circuit)
+    assert (tmp_path / "big.cir").read_text(encoding="utf-8") == expected
+    assert net.spice() == expected
+
+
+def test_columnar_netlist():
+    net = Netlist("rc", params={"c": 1e-12})
+    net.append(Component("R", "1", 1e3, ("in", "out")))
+    net.append(Component("C", "1", 2e-12, ("out", "0")))
+    net.append(Component("R", "2", 2e3, ("out", "in")))
+    net.append(Component("C", "2", "c", ("in", "0")))
+    col = ColumnarNetlist("rc", net.circuit, net.params)
+    col.append(Component("C", "3", 3e-12, ("0", "out")))
+    assert len(col) == 5
+    assert col.node_names == ["in", "out", "0"]
+    assert col.circuit[:4] == net.circuit
+    net.append(Component("C", "3", 3e-12, ("0", "out")))
+    assert col.spice() == net.spice()
+    assert col.ngspice() == net.ngspice()
+    assert col.total("C", "out") == pytest.approx(5e-12)
+    # parameters are replaced by their value
+    assert col.total("C", "in") == pytest.approx(1e-12)
+    assert col.total("C", "in", {"c": 2e-12}) == pytest.approx(2e-12)
+    with pytest.raises(KeyError, match="c"):
+        ColumnarNetlist("rc", net.circuit).total("C", "in")
+    assert list(col.names) == ["1", "1", "2", "2", "3"]
+    # the parameters are referenced explicitly, the values stay finite
+    assert col.param_names == ["c"]
+    assert list(col.param_ids) == [-1, -1, -1, 0, -1]
+    assert np.isfinite(col.values).all()
+    assert list(col.select("R", between=("in", "out"))) == [0, 2]
+    assert list(col.select(node="0")) == [1, 3, 4]
+    with pytest.raises(KeyError):
+        col.select(node="vdd")
+
+
+def test_to_network():
+    freq = Frequency(start=1, stop=10, npoints=41, unit="GHz")
+    media = DefinedGammaZ0(freq, z0=50)
+    net = Netlist("lpf")
+    for i in range(3):
+        net.append(Component("L", str(i), 1e-9 * (i + 1), ("a", "b")))
+        net.append(Component("C", str(i), 1e-12 * (i + 1), ("b", "0")))
+    net.append(Component("L", "out", 2e-9, ("b", "c")))
+    ref = cascade_list([c.network(media) for c in net.circuit])
+    assert np.allclose(net.to_network(freq).s, ref.s)
+    assert np.allclose(Netlist("empty").to_network(freq).s[:, 1, 0], 1)
+    col = ColumnarNetlist("lpf", net.circuit)
+    assert np.allclose(col.to_network(freq).s, ref.s)
+    net.append(Component("C", "p", "c", ("b", "0")))
+    with pytest.raises(ValueError):
+        net.to_network(freq)
+    with pytest.raises(ValueError):
+        ColumnarNetlist("lpf", net.circuit).to_network(freq)
@@ -0,0 +1,46 @@
+import shutil
+from os.path import join, dirname
+
+import hades.parsers.tools as tools
+from hades.parsers.process import Process
+from hades.parsers.tools import get_parser, parse, parse_cached
+
+
+def test_get_parser():
+    assert get_parser("spice") is get_parser("spice")
+    assert get_parser("spice") is not get_parser("process")
+
+
+def test_parse():
+    test_dir = join(dirname(__file__), "test_data")
+    tree1 = parse(test_dir + "/inv.cir", "spice")
+    tree2 = parse(test_dir + "/inv.cir", "spice")
+    assert tree1 == tree2
+
+
+def test_auto_parser():
+    for template in ("tlef", "layermap", "process"):
+        assert get_parser(template, "auto") is get_parser(template, "lalr")
+        assert get_parser(template, "auto").options.parser == "lalr"
+
+
+def test_parse_cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(tools, "CACHE_DIR", tmp_path / "cache")
+    proc_file = tmp_path / "test.proc"
+    shutil.copy("pdk/mock/mock.proc", proc_file)
+
+    def transform(tree):
+        return Process().transform(tree)
+
+    ref = parse_cached(proc_file, "process", transform)
+    assert len(list((tmp_path / "cache").glob("process-*.pickle"))) == 1
+    assert parse_cached(proc_file, "process", lambda t: None) == ref
+    # a new version of the transformer module invalidates the entry
+    monkeypatch.setattr(tools, "_module_source", lambda t: b"new version")
+    assert parse_cached(proc_file, "process", lambda t: None) is None
+
+    with open(proc_file, "a") as f:
+        f.write("layer 2 1.0\n")
+    diels, _ = parse_cached(proc_file, "process", transform)
+    assert len(diels) == len(ref[0]) + 1
+    assert len(list((tmp_path / "cache").glob("process-*.pickle"))) == 1
@@ -1,6 +1,108 @@
-from hades.parsers.raw import parse_raw
+import numpy as np
+import pytest
+
+from hades.parsers.raw import parse_raw, load_raw, iter_raw, load_plots
 
 
 def test_parse_raw():
     df = parse_raw("./tests/test_parser/test_data/schem_test.out")
     assert len(df["time"]) == 508
+    assert list(df.columns) == ["time", "v(out)", "v(in)", "i(vcc)"]
+    assert df["time"].iloc[-1] == 5e-8
+    assert df["i(vcc)"].iloc[1] == -2.68359e-10
+    assert df["time"].is_monotonic_increasing
+
+
+def test_load_raw(tmp_path):
+    (plot,) = load_raw("./tests/test_parser/test_data/inv.raw")
+    assert plot.name == "Transient Analysis"
+    assert plot.variables == ["time", "v(out)", "v(in)", "i(vcc)"]
+    assert plot.data.shape == (508, 4)
+    assert plot["time"][-1] == 5e-8
+
+    # same data in binary format, followed by a complex plot
+    ac = np.array([[1e3, 1 + 2j], [1e6, 3 - 4j]], dtype=complex)
+    with open(tmp_path / "inv.raw", "wb") as f:
+        for p, flags in ((plot.data, "real"), (ac, "complex")):
+            f.write(
+                f"Title: inv\nPlotname: {flags}\nFlags: {flags}\n"
+                f"No. Variables: {p.shape[1]}\nNo. Points: {p.shape[0]}\nVariables:\n".encode()
+            )
+            for i, v in enumerate(plot.variables[: p.shape[1]]):
+                f.write(f"\t{i}\t{v}\t{plot.units[i]}\n".encode())
+            f.write(b"Binary:\n" + p.tobytes())
+    tran, ac_plot = load_raw(tmp_path / "inv.raw")
+    assert isinstance(tran.data, np.memmap)
+    assert np.array_equal(tran.data, plot.data)
+    assert ac_plot.is_complex
+    assert np.array_equal(ac_plot["v(out)"], ac[:, 1])
+
+
+def test_iter_raw():
+    file = "./tests/test_parser/test_data/schem_test.out"
+    df = parse_raw(file, columns=["v(out)", "time"])
+    assert list(df.columns) == ["v(out)", "time"]
+    chunks = list(iter_raw(file, chunk_size=100, columns=["time", "i(vcc)"]))
+    assert [len(c) for c in chunks] == [100] * 5 + [8]
+    assert list(chunks[0].columns) == ["time", "i(vcc)"]
+    # running statistics in bounded memory
+    np.testing.assert_allclose(sum(c["time"].sum() for c in chunks), df["time"].sum())
+    assert max(c["time"].max() for c in chunks) == 5e-8
+
+
+def test_load_plots(tmp_path):
+    plots = load_plots("./tests/test_parser/test_data/schem_test.out")
+    assert list(plots) == ["tran1"]
+    assert plots["tran1"].data.shape == (508, 4)
+    assert np.array_equal(
+        plots["tran1"]["i(vcc)"],
+        parse_raw("./tests/test_parser/test_data/schem_test.out")["i(vcc)"],
+    )
+
+    # ac analysis printed on two tables after the transient one
+    with open("./tests/test_parser/test_data/schem_test.out") as f:
+        out = f.read()
+    line = "-" * 80 + "\n"
+    for header, rows in (
+        (
+            "frequency\tv(out)",
+            ("1.0e+03\t1.0e+00,\t-2.0e+00", "1.0e+06\t3.0e+00,\t4.0e+00"),
+        ),
+        ("frequency\tv(in)", ("1.0e+03\t5.0e+00", "1.0e+06\t6.0e+00")),
+    ):
+        out += f"\n\tinverter\n\tAC Analysis  Tue May 14 14:49:47  2024\n{line}"
+        out += f"Index   {header}\n{line}"
+        out += "".join(f"{i}\t{r}\t\n" for i, r in enumerate(rows))
+    with open(tmp_path / "ac.out", "w") as f:
+        f.write(out)
+    plots = load_plots(tmp_path / "ac.out")
+    assert list(plots) == ["tran1", "ac1"]
+    assert plots["ac1"].analysis == "ac" and plots["ac1"].is_complex
+    assert plots["ac1"].variables == ["frequency", "v(out)", "v(in)"]
+    assert np.array_equal(plots["ac1"]["v(out)"], [1 - 2j, 3 + 4j])
+    assert np.array_equal(plots["ac1"]["v(in)"], [5, 6])
+
+
+def test_load_plots_same_analysis(tmp_path):
+    line = "-" * 80 + "\n"
+
+    def table(header, rows):
+        out = f"\n\tinverter\n\tTransient Analysis  Tue May 14 14:49:47  2024\n{line}"
+        out += f"Index   {header}\n{line}"
+        return out + "".join(f"{i}\t{r}\t\n" for i, r in enumerate(rows))
+
+    # two transient analyses printing the same vectors
+    out = table("time\tv(out)", ("0.0\t1.0", "1.0\t2.0", "2.0\t3.0"))
+    out += table("time\tv(out)", ("0.0\t4.0", "1.0\t5.0", "2.0\t6.0"))
+    (tmp_path / "tran.out").write_text(out)
+    plots = load_plots(tmp_path / "tran.out")
+    assert list(plots) == ["tran1", "tran2"]
+    assert np.array_equal(plots["tran2"]["v(out)"], [4, 5, 6])
+    assert np.array_equal(parse_raw(tmp_path / "tran.out")["v(out)"], [1, 2, 3])
+
+    # a vector printed in two column groups of the same table
+    out = table("time\tv(out)\tv(in)", ("0.0\t1.0\t0.0", "1.0\t2.0\t0.0"))
+    out += table("time\tv(in)\tv(a)", ("0.0\t0.0\t1.0", "1.0\t0.0\t1.0"))
+    (tmp_path / "dup.out").write_text(out)
+    with pytest.raises(ValueError, match="v\\(in\\)"):
+        load_plots(tmp_path / "dup.out")
@@ -1,8 +1,14 @@
 import fileinput
+import os
+import sys
 import pathlib
 from filecmp import cmp
 
-from hades.wrappers.ngspice import NGSpice
+import numpy as np
+import pytest
+
+from hades.parsers.netlist import Component, Netlist
+from hades.wrappers.ngspice import NGSpice, NGSpiceShared, find_libngspice
 
 
 def test_ngspice(tmp_path):
@@ -16,3 +22,93 @@ def test_ngspice(tmp_path):
         if not line.startswith("Date:") and not line.startswith("Command:"):
             print(line, end="")
     assert cmp("./tests/test_parser/test_data/inv.raw", tmp_path / "out.raw")
+
+
+@pytest.mark.skipif(find_libngspice() is None, reason="libngspice not found")
+def test_ngspice_shared():
+    spice = NGSpiceShared()
+    with open("./tests/test_wrappers/schem_test.net") as f:
+        # without the control section
+        circuit = f.read().split(".control")[0] + ".end"
+    spice.load(circuit)
+    res = spice.run()
+    assert len(res["time"]) > 100
+    assert res["v(out)"][0] == pytest.approx(2, rel=1e-3)
+    spice.alter("vcc", 1)
+    res = spice.run()
+    assert res["v(out)"][0] == pytest.approx(1, rel=1e-3)
+
+
+FAKE_NGSPICE = """#!{python}
+import sys
+import numpy as np
+
+netlist, log = sys.argv[2], sys.argv[4]
+lines = open(netlist).read().splitlines()
+params = [float(line.split("=")[1]) for line in lines if line.startswith(".param")]
+value = np.prod(params) if params else float(lines[1].split()[-1])
+if value < 0:
+    open(log, "w").write("Error: negative value")
+    sys.exit(1)
+raw = next(line.split()[1] for line in lines if line.startswith("write"))
+for line in lines:
+    if line.startswith(".include"):
+        open(line.split()[1].strip('"'))
+# relative output in the working directory
+open("fake.out", "w").write(netlist)
+assert "set filetype = binary" in lines
+data = np.array([[0, value], [1, 2 * value]], dtype=float)
+with open(raw, "wb") as f:
+    f.write(
+        b"Title: fake\\nPlotname: Transient Analysis\\nFlags: real\\n"
+        b"No. Variables: 2\\nNo. Points: 2\\nVariables:\\n"
+        b"\\t0\\ttime\\ttime\\n\\t1\\tv(out)\\tvoltage\\nBinary:\\n" + data.tobytes()
+    )
+"""
+
+
+@pytest.fixture
+def fake_ngspice(tmp_path, monkeypatch):
+    if os.name == "nt":
+        pytest.skip("fake ngspice is a shell script")
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    (bin_dir / "ngspice").write_text(FAKE_NGSPICE.format(python=sys.executable))
+    (bin_dir / "ngspice").chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+
+
+def test_compute_many(tmp_path, fake_ngspice):
+    jobs = []
+    for i, value in enumerate((1, -1, 3)):
+        jobs.append(tmp_path / f"job{i}.cir")
+        jobs[-1].write_text(
+            f'job {i}\nV1 out 0 {value}\n.include "models.inc"\n'
+            ".control\nrun\n.endc\n.end\n"
+        )
+    (tmp_path / "models.inc").write_text("* models\n")
+    res = NGSpice().compute_many(jobs + [tmp_path / "missing.cir"], workers=2)
+    assert [r.netlist for r in res] == jobs + [tmp_path / "missing.cir"]
+    assert res[0].error is None and res[2].error is None
+    assert np.array_equal(res[2].plots["tran1"]["v(out)"], [3, 6])
+    assert "negative value" in res[1].error
+    assert "FileNotFoundError" in res[3].error
+    # the input files are not modified
+    assert "write" not in jobs[0].read_text()
+    # the jobs run in their own directory
+    assert not (tmp_path / "fake.out").exists()
+
+
+def test_sweep(fake_ngspice):
+    net = Netlist("rc", params={"r": 2})
+    net.append(Component("V", "1", 1, ("in", "0")))
+    net.append(Component("R", "1", "r", ("in", "out")))
+    net.append(Component("C", "1", "c", ("out", "0")))
+    res = NGSpice().sweep(
+        net, {"r": [1, 2, 3], "c": [1, 10]}, "tran 1n 10n", "v(out)", workers=2
+    )
+    assert res.shape == (3, 2, 2)
+    assert np.array_equal(res[:, :, 0], [[1, 10], [2, 20], [3, 30]])
+    assert np.array_equal(res[2, 1], [30, 60])
+    with pytest.raises(RuntimeError, match="negative value"):
+        NGSpice().sweep(net, {"c": [1, -1]}, "tran 1n 10n", "v(out)")
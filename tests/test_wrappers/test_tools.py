@@ -1,4 +1,10 @@
+import asyncio
+import logging
 import os
+import sys
+import time
+from subprocess import TimeoutExpired
+
 import pytest
 import hades.wrappers.tools as tools
 
@@ -10,3 +16,72 @@ def test_to_wsl():
 
     for path, ref in zip(paths, refs):
         assert tools.to_wsl(path) == ref
+
+
+def test_file_cache(tmp_path):
+    cache = tools.FileCache(tmp_path / "store", max_size=25)
+    res = tmp_path / "res.s2p"
+    res.write_text("0123456789")
+    key = cache.key(res, "ind", "--sweep", "1e9")
+    assert key == cache.key(res, "ind", "--sweep", "1e9")
+    assert key != cache.key(res, "ind", "--sweep", "2e9")
+    assert cache.get(key) is None
+
+    stored = cache.put(key, res)
+    assert stored.suffix == ".s2p"
+    assert cache.get(key) == stored
+    assert stored.read_text() == "0123456789"
+
+    cache.put("k2", res)
+    os.utime(stored, (0, 0))
+    cache.put("k3", res)
+    # the least recently used entry has been evicted
+    assert cache.get(key) is None
+    assert cache.get("k2") is not None
+    assert cache.get("k3") is not None
+    # no temporary file left in the store
+    assert sorted(f.name for f in cache.directory.iterdir()) == ["k2.s2p", "k3.s2p"]
+
+
+def test_file_cache_errors(tmp_path, monkeypatch):
+    cache = tools.FileCache(tmp_path / "store")
+    # a result that cannot be stored does not fail the simulation
+    assert cache.put("k1", tmp_path / "missing.s2p") is None
+    res = tmp_path / "res.s2p"
+    res.write_text("0123456789")
+    cache.put("k1", res)
+
+    # entry evicted by another process between the glob and the access
+    def evicted(file):
+        raise FileNotFoundError(file)
+
+    monkeypatch.setattr(tools.os, "utime", evicted)
+    assert cache.get("k1") is None
+
+
+def test_run_async(caplog, monkeypatch):
+    caplog.set_level(logging.DEBUG)
+    script = "import sys; print('out1'); print('out2'); print('err', file=sys.stderr)"
+    proc = asyncio.run(tools.run_async([sys.executable, "-c", script]))
+    assert proc.returncode == 0
+    assert proc.stdout.splitlines() == ["out1", "out2"]
+    assert proc.stderr == "err\n"
+    assert "out2" in caplog.messages
+
+    with pytest.raises(TimeoutExpired):
+        asyncio.run(
+            tools.run_async(
+                [sys.executable, "-c", "import time; time.sleep(10)"], timeout=0.2
+            )
+        )
+
+    # only one process at a time
+    monkeypatch.setattr(tools, "MAX_PROCESSES", 1)
+
+    async def many():
+        cmd = [sys.executable, "-c", "import time; time.sleep(0.2)"]
+        return await asyncio.gather(*(tools.run_async(cmd) for _ in range(3)))
+
+    start = time.perf_counter()
+    assert all(p.returncode == 0 for p in asyncio.run(many()))
+    assert time.perf_counter() - start > 0.6